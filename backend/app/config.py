@@ -11,6 +11,80 @@ class Settings(BaseSettings):
     gemini_api_key: str
     cors_origins: List[str] = ["http://localhost:5173"]
 
+    # Authentification : cache des utilisateurs (évite une requête SQL par appel)
+    user_cache_max_entries: int = 1024
+    user_cache_ttl: float = 60.0
+    # Hachage des mots de passe : coût bcrypt, threads dédiés et file d'attente maximale
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 16
+
+    # Base de données : pool de connexions du moteur asynchrone des routes
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    # Profil SQLite de production (optionnel) : WAL, pragmas et écrivain unique par lots
+    sqlite_profile: bool = False
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size_kb: int = 65536
+    sqlite_busy_timeout_ms: int = 5000
+    write_batch_size: int = 100
+    write_batch_delay: float = 0.002
+    # Messages du chat enregistrés en différé : ids réservés par blocs
+    chat_id_block_size: int = 100
+    # Écriture d'un message en échec : nouveaux essais, premier délai (doublé à chaque essai)
+    chat_write_retries: int = 3
+    chat_write_retry_delay: float = 0.5
+    # Ingestion de rapports : taille des lots insérés en une transaction
+    report_ingest_chunk_size: int = 1000
+    # Exports : lignes lues par aller-retour du curseur et écrites par fragment
+    export_chunk_size: int = 1000
+
+    # Appels Gemini : nombre maximal d'appels simultanés et délais (en secondes)
+    gemini_max_concurrency: int = 8
+    gemini_timeout: float = 60.0
+    gemini_queue_timeout: float = 10.0
+    # Revue de cohorte : nombre maximal de patients et d'analyses simultanées
+    cohort_max_patients: int = 50
+    cohort_max_concurrency: int = 8
+    # Jobs d'analyse en arrière-plan : workers, tentatives et délai avant nouvel essai (doublé à chaque échec)
+    job_workers: int = 2
+    job_max_attempts: int = 3
+    job_retry_backoff: float = 5.0
+    job_retry_backoff_max: float = 300.0
+
+    # Mémoire du chat : derniers échanges repris tels quels (0 = désactivée), les plus anciens
+    # résumés par groupes de chat_memory_fold_turns échanges
+    chat_memory_turns: int = 3
+    chat_memory_fold_turns: int = 3
+    chat_memory_summary_max_tokens: int = 400
+    chat_memory_message_max_chars: int = 2000
+
+    # Cache des réponses de l'IA (LRU, durée de vie en secondes)
+    answer_cache_max_entries: int = 512
+    answer_cache_ttl: float = 3600.0
+
+    # Taille maximale du contexte patient envoyé à Gemini (tokens estimés)
+    context_token_budget: int = 24000
+
+    # Résumés structurés des rapports : passage de fond toutes les `interval` secondes
+    # (0 = désactivé, par défaut : chaque rapport est envoyé à Gemini), au plus
+    # max_per_pass rapports par passage ; un rapport en échec est écarté pendant un délai doublé
+    report_condense_interval: float = 0.0
+    report_condense_batch_size: int = 20
+    report_condense_concurrency: int = 2
+    report_condense_max_per_pass: int = 100
+    report_condense_retry_backoff: float = 600.0
+    report_condense_retry_backoff_max: float = 86400.0
+
+    # Recherche d'extraits pertinents (BM25 local) pour les dossiers volumineux ; 0 = désactivé
+    retrieval_top_k: int = 8
+    retrieval_chunk_words: int = 80
+    retrieval_min_context_tokens: int = 2000
+
+    # Métriques Prometheus exposées sur GET /metrics (middleware HTTP compris)
+    metrics_enabled: bool = True
+
     class Config:
         # Chercher le fichier .env dans le répertoire backend
         env_file = os.path.join(Path(__file__).parent.parent, ".env")
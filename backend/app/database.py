@@ -1,13 +1,111 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .models.database import Base
 from .config import settings
+from .metrics import DB_CHECKOUT, DB_CONNECTION_HELD
+from .services.db_writer import DatabaseWriter
+from .services.search import create_search_index
+from .services.patient_stats import create_patient_stats
+from .services.report_abstracts import ReportCondenser, create_abstract_triggers
 
+# Pilotes asynchrones correspondant aux URL synchrones de DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def async_database_url(database_url: str):
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool asynchrone qui mesure l'attente d'une connexion (ouverture comprise)"""
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_CHECKOUT.observe(time.perf_counter() - started_at)
+
+def _pool_options(database_url: str) -> dict:
+    """Options du pool de connexions (sauf SQLite en mémoire, qui n'a qu'une connexion)"""
+    url = make_url(database_url)
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        # aiosqlite n'utilise pas de pool par défaut : une connexion ouverte par session
+        "poolclass": InstrumentedQueuePool,
+    }
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return options
+
+# Moteur synchrone : démarrage (création des tables, données d'exemple), migrations et scripts
 engine = create_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asynchrone : routes de l'API, les requêtes ne bloquent plus la boucle d'événements
+async_engine = create_async_engine(async_database_url(settings.database_url), **_pool_options(settings.database_url))
+# expire_on_commit=False : pas de rechargement implicite (impossible en asynchrone) après un commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def sqlite_profile_enabled() -> bool:
+    return settings.sqlite_profile and make_url(settings.database_url).get_backend_name() == "sqlite"
+
+def _apply_sqlite_profile(dbapi_connection, connection_record):
+    """
+    Pragmas appliqués à chaque nouvelle connexion : journal WAL (les lectures ne bloquent
+    plus l'écriture), synchronous=NORMAL (sûr en WAL), mmap et cache de pages plus grands,
+    attente du verrou au lieu d'une erreur immédiate "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+if sqlite_profile_enabled():
+    event.listen(engine, "connect", _apply_sqlite_profile)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_profile)
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        DB_CONNECTION_HELD.observe(time.perf_counter() - checked_out_at)
+
+# Durée d'utilisation des connexions du moteur asynchrone (GET /metrics)
+event.listen(async_engine.sync_engine, "checkout", _on_checkout)
+event.listen(async_engine.sync_engine, "checkin", _on_checkin)
+
+# Écritures du chat : regroupées par un écrivain unique (démarré avec l'application)
+db_writer = DatabaseWriter(AsyncSessionLocal, settings.write_batch_size, settings.write_batch_delay)
+
+# Condensation des rapports en tâche de fond (démarrée avec l'application)
+report_condenser = ReportCondenser(
+    AsyncSessionLocal, settings.report_condense_batch_size, settings.report_condense_concurrency,
+    settings.report_condense_interval, settings.report_condense_max_per_pass,
+    settings.report_condense_retry_backoff, settings.report_condense_retry_backoff_max
+)
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        create_search_index(connection)
+        create_patient_stats(connection)
+        create_abstract_triggers(connection)
 
 def get_db():
     db = SessionLocal()
@@ -15,3 +113,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
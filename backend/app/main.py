@@ -1,11 +1,19 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from .config import settings
-from .database import create_tables, get_db
-from .routers import auth, patients, chat
+from .database import create_tables, get_db, async_engine, db_writer, report_condenser
+from .routers import auth, patients, chat, search, reports, export, jobs
 from .models.database import User, Patient, Report, Comorbidity, patient_comorbidity
-from .services.auth import get_password_hash
+from .pagination import NEXT_CURSOR_HEADER
+from .metrics import MetricsMiddleware, registry
+from .services.auth import get_password_hash, password_hasher, user_cache
+from .services.job_queue import job_queue
+from .services.chat_memory import conversation_memory
+from .services.chat_store import chat_store
+from .schemas.schemas import parse_birth_date
+from datetime import date
 
 app = FastAPI(title="RadGPT API", version="1.0.0")
 
@@ -16,12 +24,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+if settings.metrics_enabled:
+    # Ajouté après CORS : mesure aussi les réponses produites par CORS (préflight)
+    app.add_middleware(MetricsMiddleware)
+
 # Inclure les routers
 app.include_router(auth.router)
 app.include_router(patients.router)
 app.include_router(chat.router)
+app.include_router(search.router)
+app.include_router(reports.router)
+app.include_router(export.router)
+app.include_router(jobs.router)
 
 @app.on_event("startup")
 def startup_event():
@@ -29,6 +46,32 @@ def startup_event():
     # Créer des données de test si nécessaire
     create_sample_data()
 
+@app.on_event("startup")
+async def start_db_writer():
+    # Écrivain de la base : écritures regroupées et messages du chat enregistrés en différé
+    db_writer.start()
+
+@app.on_event("startup")
+async def start_job_queue():
+    # Jobs d'analyse : reprise des jobs en attente ou interrompus, puis démarrage des workers
+    await job_queue.start()
+
+@app.on_event("startup")
+async def start_report_condenser():
+    # Résumés structurés des rapports : backlog traité en fond si REPORT_CONDENSE_INTERVAL > 0 (désactivé par défaut)
+    report_condenser.start(chat.gemini_service.condense_report)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Tâches de fond arrêtées, jobs en cours remis en attente, puis écritures encore en file enregistrées avant la fermeture du pool
+    await report_condenser.stop()
+    await conversation_memory.stop()
+    await job_queue.stop()
+    await chat_store.stop()
+    await db_writer.stop()
+    await async_engine.dispose()
+    await password_hasher.stop()
+
 def create_sample_data():
     """Créer des données d'exemple pour les tests"""
     db = next(get_db())
@@ -128,14 +171,19 @@ def create_sample_data():
     
     for patient_data in patients_data:
         existing_patient = db.query(Patient).filter(Patient.id == patient_data["id"]).first()
+        if existing_patient and existing_patient.department is None:
+            # Base créée avant la colonne department
+            existing_patient.department = patient_data["specialty"]
+            db.commit()
         if not existing_patient:
             patient = Patient(
                 id=patient_data["id"],
                 last_name=patient_data["last_name"],
                 first_name=patient_data["first_name"],
-                birth_date=patient_data["birth_date"],
+                birth_date=parse_birth_date(patient_data["birth_date"]),
                 primary_condition=patient_data["primary_condition"],
-                current_status=patient_data["current_status"]
+                current_status=patient_data["current_status"],
+                department=patient_data["specialty"]
             )
             db.add(patient)
             db.commit()  # Commit pour sauvegarder le patient
@@ -211,7 +259,7 @@ def create_sample_data():
                     patient_id=patient_data["id"],
                     type=report_data["type"],
                     title=report_data["title"],
-                    date=report_data["date"],
+                    date=date.fromisoformat(report_data["date"]),
                     doctor=report_data["doctor"],
                     summary=report_data["summary"],
                     full_text=report_data["full_text"]
@@ -228,3 +276,35 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@registry.collector
+def collect_service_stats():
+    """Compteurs tenus par les services, lus au moment de l'export"""
+    caches = {
+        "answer": chat.gemini_service.answer_cache,
+        "context": chat.gemini_service.context_builder,
+        "user": user_cache,
+    }
+    yield ("radgpt_cache_hits_total", "counter", "Lectures servies par le cache",
+           [({"cache": name}, cache.hits) for name, cache in caches.items()])
+    yield ("radgpt_cache_misses_total", "counter", "Lectures absentes du cache ou expirées",
+           [({"cache": name}, cache.misses) for name, cache in caches.items()])
+    single_flight = chat.gemini_service.single_flight
+    yield ("radgpt_gemini_coalesced_total", "counter", "Requêtes servies par un appel Gemini identique déjà en cours",
+           [({}, single_flight.coalesced)])
+    yield ("radgpt_gemini_in_flight", "gauge", "Appels Gemini en cours",
+           [({}, chat.gemini_service.stats.in_flight)])
+    pool = async_engine.pool
+    if hasattr(pool, "checkedout"):
+        yield ("radgpt_db_connections_checked_out", "gauge", "Connexions du pool asynchrone en cours d'utilisation",
+               [({}, pool.checkedout())])
+    jobs = job_queue.snapshot()
+    yield ("radgpt_jobs", "gauge", "Jobs d'analyse par état (en file, en attente de réessai, en cours)",
+           [({"state": "queued"}, jobs["queued"]), ({"state": "waiting_retry"}, jobs["waiting_retry"]),
+            ({"state": "running"}, jobs["in_progress"])])
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Métriques au format texte Prometheus (latences HTTP, Gemini, base, caches)"""
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,208 @@
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Métriques au format texte Prometheus (GET /metrics), sans dépendance externe.
+# Les mesures du chemin critique (requêtes HTTP, appels Gemini, connexions de la base)
+# sont de simples additions en mémoire ; les compteurs déjà tenus par les services
+# (caches, file des jobs...) sont lus seulement au moment de l'export, par des collecteurs.
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+GEMINI_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+class Histogram(_Metric):
+    """Histogramme à seuils fixes : une recherche dichotomique et trois additions par mesure"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = HTTP_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values):
+        series = self._values.get(label_values)
+        if series is None:
+            # Comptes par seuil (le dernier pour +Inf), somme, nombre
+            series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        names = self.labels + ("le",)
+        for label_values, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(names, label_values + (_format_value(bound),))} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    """
+    Métriques enregistrées et collecteurs appelés à chaque export. Un collecteur renvoie
+    des familles (nom, type, aide, [(labels, valeur)]) lues dans les statistiques des services.
+    """
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = HTTP_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, metric_type, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "radgpt_http_request_duration_seconds", "Durée des requêtes HTTP jusqu'à la fin de la réponse",
+    ["method", "route", "status"], HTTP_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge("radgpt_http_requests_in_flight", "Requêtes HTTP en cours")
+
+GEMINI_REQUESTS = registry.counter(
+    "radgpt_gemini_requests_total", "Appels Gemini par mode (generate, stream) et issue (ok, error, timeout, rejected, cancelled)",
+    ["mode", "outcome"]
+)
+GEMINI_REQUEST_DURATION = registry.histogram(
+    "radgpt_gemini_request_duration_seconds", "Durée des appels Gemini, attente du pool exclue",
+    ["mode", "outcome"], GEMINI_BUCKETS
+)
+GEMINI_QUEUE_WAIT = registry.histogram(
+    "radgpt_gemini_queue_wait_seconds", "Attente d'une place dans le pool d'appels Gemini", [],
+    (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0)
+)
+GEMINI_TOKENS = registry.counter(
+    "radgpt_gemini_tokens_total", "Tokens Gemini (usage_metadata, ou estimation en son absence)", ["type"]
+)
+
+DB_CHECKOUT = registry.histogram(
+    "radgpt_db_checkout_seconds", "Attente d'une connexion du pool asynchrone", [], DB_BUCKETS
+)
+DB_CONNECTION_HELD = registry.histogram(
+    "radgpt_db_connection_held_seconds", "Durée d'utilisation d'une connexion, de la sortie au retour au pool",
+    [], DB_BUCKETS
+)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : requêtes en cours et durée par méthode, route (modèle de chemin,
+    pas l'URL) et statut. Un flux (SSE, export) est mesuré jusqu'à son dernier fragment.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = next(
+                (route.path for route in scope["app"].routes if getattr(route, "endpoint", None) is endpoint),
+                "unmatched"
+            )
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started_at, scope["method"], self._route(scope), str(status[0])
+            )
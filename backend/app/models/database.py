@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Table, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -21,6 +21,8 @@ class User(Base):
     name = Column(String, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(String, default=True)
+    # Incrémenté à chaque changement de mot de passe : invalide les jetons émis avant
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Patient(Base):
@@ -29,9 +31,10 @@ class Patient(Base):
     id = Column(String, primary_key=True, index=True)
     last_name = Column(String, nullable=False)
     first_name = Column(String, nullable=False)
-    birth_date = Column(String, nullable=False)
+    birth_date = Column(Date, nullable=False)
     primary_condition = Column(String)
     current_status = Column(String)
+    department = Column(String, index=True)  # Fachbereich normalisé (schemas.normalize_department)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relations
@@ -40,12 +43,16 @@ class Patient(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # Filtre de date du chat : rapports d'un patient sur une période
+        Index("ix_reports_patient_id_date", "patient_id", "date"),
+    )
     
     id = Column(String, primary_key=True, index=True)
     patient_id = Column(String, ForeignKey("patients.id"))
     type = Column(String, nullable=False)  # 'Radiologie', 'Pathologie', 'Arztbrief'
     title = Column(String, nullable=False)
-    date = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
     doctor = Column(String, nullable=False)
     summary = Column(Text)
     full_text = Column(Text)
@@ -53,6 +60,8 @@ class Report(Base):
     
     # Relations
     patient = relationship("Patient", back_populates="reports")
+    # Chargé seulement à la demande (selectinload) : sinon None, le texte complet est utilisé
+    abstract = relationship("ReportAbstract", uselist=False, lazy="noload", viewonly=True)
 
 class Comorbidity(Base):
     __tablename__ = "comorbidities"
@@ -65,9 +74,101 @@ class Comorbidity(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Historique d'un patient dans l'ordre, et reprise après un message donné
+        Index("ix_chat_messages_patient_created_id", "patient_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(String, ForeignKey("patients.id"))
     sender = Column(String, nullable=False)  # 'user' or 'ai'
     message = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChatMemory(Base):
+    """
+    Mémoire du fil de discussion d'un patient : résumé des échanges anciens, mis à jour
+    par étapes (services/chat_memory.py) ; les messages après (summarized_until_at,
+    summarized_until_id) ne sont pas encore résumés
+    """
+    __tablename__ = "chat_memories"
+    
+    patient_id = Column(String, ForeignKey("patients.id"), primary_key=True)
+    summary = Column(Text)
+    summarized_until_at = Column(DateTime)
+    summarized_until_id = Column(Integer)
+    summarized_messages = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DepartmentCount(Base):
+    """Nombre de patients par Fachbereich, tenu à jour par des triggers (services/patient_stats.py)"""
+    __tablename__ = "department_counts"
+    
+    department = Column(String, primary_key=True)  # '' : sans Fachbereich
+    count = Column(Integer, nullable=False, default=0)
+
+class ConditionCount(Base):
+    """Nombre de patients par diagnostic, tenu à jour par des triggers (services/patient_stats.py)"""
+    __tablename__ = "condition_counts"
+    __table_args__ = (
+        # Diagnostics les plus fréquents sans parcourir la table
+        Index("ix_condition_counts_count", "count"),
+    )
+    
+    primary_condition = Column(String, primary_key=True)  # '' : sans diagnostic
+    count = Column(Integer, nullable=False, default=0)
+
+class AnalysisJob(Base):
+    """Analyse Gemini exécutée en arrière-plan (services/job_queue.py)"""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # Jobs à reprendre au démarrage, par priorité puis ancienneté
+        Index("ix_analysis_jobs_status_priority", "status", "priority", "created_at"),
+    )
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # 'patient_question', 'report_analysis'
+    patient_id = Column(String, ForeignKey("patients.id"), index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False)  # 'queued', 'running', 'succeeded', 'failed'
+    priority = Column(Integer, nullable=False, default=0)  # la plus haute d'abord
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    result = Column(Text)
+    error = Column(Text)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    run_after = Column(DateTime)  # prochaine tentative après un échec (backoff)
+
+class ReportAbstract(Base):
+    """
+    Version condensée d'un rapport (Befund, Diagnose, Empfehlung), produite une fois par
+    services/report_abstracts.py ; passe à 'stale' par trigger quand le texte du rapport change
+    """
+    __tablename__ = "report_abstracts"
+    
+    report_id = Column(String, ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False)
+    source_hash = Column(String, nullable=False)  # empreinte du titre, du résumé et du texte condensés
+    status = Column(String, nullable=False, index=True)  # 'fresh', 'stale'
+    findings = Column(Text)
+    diagnosis = Column(Text)
+    recommendation = Column(Text)
+    source_tokens = Column(Integer)
+    abstract_tokens = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.status == "fresh"
+
+class IdSequence(Base):
+    """Compteurs d'identifiants distribués par blocs (messages enregistrés en différé)"""
+    __tablename__ = "id_sequences"
+    
+    name = Column(String, primary_key=True)
+    next_value = Column(Integer, nullable=False)
@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException, Response
+
+# En-tête portant le curseur de la page suivante (absent sur la dernière page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: list) -> str:
+    """Curseur opaque : valeurs de la clé de tri du dernier élément, en base64 url-safe"""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+async def paginate(db, statement, limit: int, response: Response, key):
+    """
+    Exécute une requête déjà filtrée et triée selon la clé du curseur : lit un élément
+    de plus que la page pour savoir s'il en reste, et place le curseur suivant dans l'en-tête
+    """
+    items = (await db.scalars(statement.limit(limit + 1))).all()
+    return page_items(items, limit, response, key)
+
+def page_items(items: list, limit: int, response: Response, key):
+    """Coupe une liste déjà triée (limit + 1 éléments au plus lus) à la taille de la page"""
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(items[-1]))
+    return items
@@ -1,61 +1,101 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from ..database import get_db
+from ..database import get_async_db
 from ..models.database import User
 from ..schemas.schemas import Token, UserCreate, User as UserSchema
-from ..services.auth import verify_password, get_password_hash, create_access_token, verify_token
+from ..services.auth import (
+    create_access_token, decode_token, user_is_active, user_token_claims,
+    user_cache, password_hasher, HashingBusyError
+)
 from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.scalars(select(User).where(User.email == email))).first()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Rend la connexion au pool avant l'attente du hachage : l'utilisateur reste lisible, détaché
+    await db.close()
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _hashing_busy(error: HashingBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": "2"},
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    email = verify_token(token)
-    if email is None:
+    payload = decode_token(token)
+    if payload is None:
         raise credentials_exception
-    user = get_user_by_email(db, email=email)
+    email = payload["sub"]
+    
+    user = user_cache.get(email)
     if user is None:
+        # Recherche par clé primaire si le jeton porte l'id (jetons récents)
+        user_id = payload.get("uid")
+        user = await db.get(User, user_id) if user_id is not None else await get_user_by_email(db, email=email)
+        if user is None or user.email != email:
+            raise credentials_exception
+        # Détaché de la session : l'objet en cache ne doit pas être expiré par un commit
+        db.expunge(user)
+        user_cache.set(email, user)
+    
+    # Jeton émis avant une désactivation ou un changement de mot de passe
+    if not user_is_active(user):
+        raise credentials_exception
+    if "act" in payload and payload["act"] != user_is_active(user):
+        raise credentials_exception
+    if "ver" in payload and payload["ver"] != (user.token_version or 0):
+        raise credentials_exception
+    # Ancien format (empreinte du hash dans le jeton) : nouvelle connexion demandée
+    if "pwd" in payload:
         raise credentials_exception
     return user
 
 @router.post("/register", response_model=UserSchema)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user_by_email(db, email=user.email)
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    await db.close()
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HashingBusyError as e:
+        raise _hashing_busy(e)
     db_user = User(
         email=user.email,
         name=user.name,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HashingBusyError as e:
+        raise _hashing_busy(e)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,10 +104,18 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         )
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=user_token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.get("/stats")
+def get_auth_stats(current_user: User = Depends(get_current_user)):
+    """Statistiques du cache des utilisateurs et du hachage des mots de passe"""
+    return {
+        "user_cache": user_cache.snapshot(),
+        "password_hashing": password_hasher.snapshot(),
+    }
+
 @router.get("/me", response_model=UserSchema)
 def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
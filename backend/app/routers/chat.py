@@ -1,20 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from ..database import get_db
-from ..models.database import Patient, ChatMessage, User
-from ..schemas.schemas import ChatRequest, ChatResponse, ChatMessage as ChatMessageSchema
-from ..services.gemini_service import GeminiService
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal, db_writer, report_condenser
+from ..models.database import Patient, Report, ChatMessage, ChatMemory, User
+from ..schemas.schemas import ChatRequest, ChatResponse, CohortRequest, ChatHistoryStatus, ChatMessage as ChatMessageSchema
+from ..services.gemini_service import GeminiService, GeminiBusyError
+from ..services.context_builder import parse_filter_date
+from ..services.chat_store import chat_store
+from ..services.chat_memory import conversation_memory
+from ..services.patient_stats import filter_patients
 from ..routers.auth import get_current_user
-from typing import List
+from ..pagination import decode_cursor, page_items
+from typing import List, Optional
+from datetime import datetime
+import anyio
+import asyncio
+import json
 import time
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 gemini_service = GeminiService()
 
+# Ajouté à une réponse dont le flux a été interrompu avant la fin
+PARTIAL_ANSWER_MARKER = "\n\n*[Antwort unvollständig – Übertragung abgebrochen]*"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# Taille de page de l'historique quand un curseur est fourni sans limit
+HISTORY_PAGE_SIZE = 500
+
+def _sse(data: dict, event: str = None) -> str:
+    """Formate un événement Server-Sent Events"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+async def _save_message(patient_id: str, sender: str, message: str) -> int:
+    """
+    Enregistre un message en différé (hors de la session de la requête, déjà fermée
+    quand un flux se termine) : l'id est attribué tout de suite, l'écriture suit par lot
+    """
+    return await chat_store.save(patient_id, sender, message)
+
+def _message_key(message) -> tuple:
+    return (message.created_at, message.id)
+
+async def _patient_exists(db: AsyncSession, patient_id: str) -> bool:
+    return await db.scalar(select(Patient.id).where(Patient.id == patient_id)) is not None
+
+async def _load_patient_for_chat(db: AsyncSession, patient_id: str, date_filter: dict = None):
+    """
+    Patient avec ses comorbidités et uniquement les rapports de la période demandée
+    (avec leur résumé structuré) : le filtre de date est appliqué en SQL (index patient_id, date)
+    """
+    return await db.scalar(
+        select(Patient).options(
+            selectinload(_reports_in_period(date_filter)).selectinload(Report.abstract),
+            selectinload(Patient.comorbidities)
+        ).where(Patient.id == patient_id)
+    )
+
+def _period(date_filter: dict = None):
+    if date_filter and date_filter.get('startDate') and date_filter.get('endDate'):
+        return parse_filter_date(date_filter['startDate']), parse_filter_date(date_filter['endDate'])
+    return None, None
+
+def _reports_in_period(date_filter: dict = None):
+    """Relation Patient.reports restreinte à la période en SQL (index patient_id, date)"""
+    start_date, end_date = _period(date_filter)
+    if start_date is None:
+        return Patient.reports
+    return Patient.reports.and_(Report.date >= start_date, Report.date <= end_date)
+
+def _date_filter_dict(chat_request: ChatRequest):
+    if not chat_request.date_filter:
+        return None
+    return {
+        'startDate': chat_request.date_filter.startDate,
+        'endDate': chat_request.date_filter.endDate
+    }
+
 @router.post("/general", response_model=ChatResponse)
 async def chat_general(
     chat_request: dict,  # {"message": "question"}
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     message = chat_request.get("message", "")
@@ -30,94 +101,388 @@ async def chat_general(
         
         return ChatResponse(response=ai_response, message_id=message_id)
     
+    except GeminiBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing general chat request: {str(e)}")
 
+@router.post("/general/stream")
+async def chat_general_stream(
+    chat_request: dict,  # {"message": "question"}
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Variante SSE de /chat/general. Comme elle, sans fil de discussion : la question et
+    la réponse ne sont pas enregistrées (aucune table ni route ne lit un historique
+    général), l'événement `done` ne porte donc pas de message_id.
+    """
+    message = chat_request.get("message", "")
+    if not message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    async def event_stream():
+        try:
+            # Session propre au flux : celle de la requête est fermée avant l'envoi du corps
+            async with AsyncSessionLocal() as db:
+                async for chunk in gemini_service.stream_general_query(message, db):
+                    yield _sse({"token": chunk})
+        except GeminiBusyError as e:
+            yield _sse({"detail": str(e)}, event="error")
+            return
+        except Exception as e:
+            yield _sse({"detail": f"Error processing general chat request: {str(e)}"}, event="error")
+            return
+        yield _sse({}, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/", response_model=ChatResponse)
 async def chat_with_ai(
     chat_request: ChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Vérifier que le patient existe
-    patient = db.query(Patient).options(
-        joinedload(Patient.reports),
-        joinedload(Patient.comorbidities)
-    ).filter(Patient.id == chat_request.patient_id).first()
-    
-    if not patient:
+    if not await _patient_exists(db, chat_request.patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
+    # Rend la connexion de la requête au pool : l'écrivain en utilise une autre
+    await db.commit()
     
     # Sauvegarder le message de l'utilisateur
-    user_message = ChatMessage(
-        patient_id=chat_request.patient_id,
-        sender="user",
-        message=chat_request.message
-    )
-    db.add(user_message)
-    db.commit()
+    question_id = await _save_message(chat_request.patient_id, "user", chat_request.message)
     
     try:
         # Préparer le filtre de date s'il existe
-        date_filter = None
-        if chat_request.date_filter:
-            date_filter = {
-                'startDate': chat_request.date_filter.startDate,
-                'endDate': chat_request.date_filter.endDate
-            }
+        date_filter = _date_filter_dict(chat_request)
+        patient = await _load_patient_for_chat(db, chat_request.patient_id, date_filter)
+        # Termine la transaction de lecture : la connexion retourne au pool pendant l'appel à Gemini
+        await db.commit()
         
-        # Obtenir la réponse de Gemini
-        ai_response = await gemini_service.get_patient_analysis(patient, chat_request.message, date_filter)
+        # Obtenir la réponse de Gemini, avec la mémoire bornée du fil
+        context = gemini_service.build_patient_context(patient, date_filter, chat_request.message)
+        history = await conversation_memory.load(chat_request.patient_id, exclude_id=question_id,
+                                                 question=chat_request.message)
+        ai_response = await gemini_service.get_patient_analysis(
+            patient, chat_request.message, date_filter,
+            use_cache=chat_request.use_cache, context=context, history=history
+        )
         
         # Sauvegarder la réponse de l'IA
-        ai_message = ChatMessage(
-            patient_id=chat_request.patient_id,
-            sender="ai",
-            message=ai_response
-        )
-        db.add(ai_message)
-        db.commit()
-        db.refresh(ai_message)
+        message_id = await _save_message(chat_request.patient_id, "ai", ai_response)
+        conversation_memory.schedule_fold(chat_request.patient_id, gemini_service.summarize_conversation)
         
-        return ChatResponse(response=ai_response, message_id=ai_message.id)
+        return ChatResponse(response=ai_response, message_id=message_id,
+                            context={**context.as_metadata(), **history.as_metadata()})
     
+    except GeminiBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
+@router.post("/stream")
+async def chat_with_ai_stream(
+    chat_request: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Variante SSE de chat_with_ai : événements `data` avec les fragments de texte,
+    puis `done` avec l'id du message enregistré (ou `error`)
+    """
+    if not await _patient_exists(db, chat_request.patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    await db.commit()
+    
+    question_id = await _save_message(chat_request.patient_id, "user", chat_request.message)
+
+    # Le flux s'exécute une fois la session fermée : toutes les données utilisées
+    # par le prompt doivent donc déjà être chargées
+    date_filter = _date_filter_dict(chat_request)
+    patient = await _load_patient_for_chat(db, chat_request.patient_id, date_filter)
+    await db.commit()
+    context = gemini_service.build_patient_context(patient, date_filter, chat_request.message)
+    history = await conversation_memory.load(chat_request.patient_id, exclude_id=question_id,
+                                             question=chat_request.message)
+
+    async def event_stream():
+        parts = []
+        saved = False
+        try:
+            try:
+                async for chunk in gemini_service.stream_patient_analysis(
+                    patient, chat_request.message, date_filter,
+                    use_cache=chat_request.use_cache, context=context, history=history
+                ):
+                    parts.append(chunk)
+                    yield _sse({"token": chunk})
+            except GeminiBusyError as e:
+                yield _sse({"detail": str(e)}, event="error")
+                return
+            except Exception as e:
+                yield _sse({"detail": f"Error processing chat request: {str(e)}"}, event="error")
+                return
+
+            message_id = await _save_message(chat_request.patient_id, "ai", "".join(parts))
+            saved = True
+            conversation_memory.schedule_fold(chat_request.patient_id, gemini_service.summarize_conversation)
+            yield _sse({"message_id": message_id, "context": {**context.as_metadata(), **history.as_metadata()}},
+                       event="done")
+        finally:
+            # Client déconnecté ou erreur en cours de route : conserver la réponse partielle
+            # (protégé de l'annulation déclenchée par la déconnexion)
+            if not saved and parts:
+                with anyio.CancelScope(shield=True):
+                    await _save_message(chat_request.patient_id, "ai", "".join(parts) + PARTIAL_ANSWER_MARKER)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def _load_cohort(db: AsyncSession, cohort: CohortRequest, date_filter: dict = None):
+    """
+    Patients de la cohorte avec leurs rapports de la période et leurs résumés structurés :
+    des requêtes groupées (patients, puis rapports et résumés de tous les patients en IN),
+    quel que soit leur nombre
+    """
+    query = select(Patient).options(
+        selectinload(_reports_in_period(date_filter)).selectinload(Report.abstract),
+        selectinload(Patient.comorbidities)
+    )
+    if cohort.patient_ids:
+        patient_ids = list(dict.fromkeys(cohort.patient_ids))
+        if len(patient_ids) > settings.cohort_max_patients:
+            raise HTTPException(
+                status_code=400, detail=f"At most {settings.cohort_max_patients} patients per cohort"
+            )
+        patients = (await db.scalars(query.where(Patient.id.in_(patient_ids)))).all()
+        found = {patient.id: patient for patient in patients}
+        return [found[i] for i in patient_ids if i in found], [i for i in patient_ids if i not in found]
+
+    if not cohort.department and not date_filter:
+        raise HTTPException(status_code=400, detail="patient_ids, department or date_filter is required")
+    query = filter_patients(query, cohort.department, *_period(date_filter))
+    patients = (await db.scalars(query.order_by(Patient.id).limit(settings.cohort_max_patients))).all()
+    return patients, []
+
+@router.post("/cohort")
+async def analyze_cohort(
+    cohort: CohortRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Revue de cohorte (tumor board) en SSE : un événement `start` avec les patients retenus,
+    un événement `result` (ou `error`) par patient dans l'ordre où les analyses se terminent,
+    puis `done`. Les analyses tournent en parallèle, au plus cohort_max_concurrency à la fois.
+    """
+    date_filter = _date_filter_dict(cohort)
+    if date_filter and not all(date_filter.values()):
+        # Une seule borne retiendrait tous les patients sans le signaler
+        if any(date_filter.values()):
+            raise HTTPException(status_code=422, detail="date_filter requires both startDate and endDate")
+        date_filter = None
+    patients, missing = await _load_cohort(db, cohort, date_filter)
+    # Tout est chargé : la connexion est rendue avant les appels Gemini
+    await db.commit()
+    # Au plus la taille du pool Gemini : les analyses en trop attendent ici, sans le délai
+    # d'attente du pool (gemini_queue_timeout) qui les ferait échouer
+    concurrency = max(1, min(settings.cohort_max_concurrency, settings.gemini_max_concurrency, len(patients)))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(patient):
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                analysis = await gemini_service.analyze_patient_reports(patient, date_filter, cohort.use_cache)
+                return patient, analysis, None, time.perf_counter() - started_at
+            except Exception as e:
+                return patient, None, e, time.perf_counter() - started_at
+
+    async def event_stream():
+        started_at = time.perf_counter()
+        tasks = [asyncio.ensure_future(analyze(patient)) for patient in patients]
+        failed = 0
+        try:
+            yield _sse({
+                "patient_ids": [patient.id for patient in patients],
+                "missing": missing,
+                "concurrency": concurrency,
+            }, event="start")
+            for next_result in asyncio.as_completed(tasks):
+                patient, analysis, error, elapsed = await next_result
+                result = {
+                    "patient_id": patient.id,
+                    "name": f"{patient.first_name} {patient.last_name}",
+                    "report_count": len(patient.reports),
+                    "elapsed_ms": round(1000 * elapsed, 1),
+                }
+                if error is None:
+                    yield _sse({**result, "analysis": analysis}, event="result")
+                else:
+                    failed += 1
+                    yield _sse({**result, "detail": str(error)}, event="error")
+            yield _sse({
+                "completed": len(patients) - failed,
+                "failed": failed,
+                "elapsed_ms": round(1000 * (time.perf_counter() - started_at), 1),
+            }, event="done")
+        finally:
+            # Client déconnecté : les analyses pas encore terminées sont abandonnées
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/stats")
+def get_chat_stats(current_user: User = Depends(get_current_user)):
+    """Statistiques des appels Gemini (latence, file d'attente, débit), des caches, du routage et des écritures"""
+    return {
+        "gemini": gemini_service.stats.snapshot(),
+        "answer_cache": gemini_service.answer_cache.snapshot(),
+        "single_flight": gemini_service.single_flight.snapshot(),
+        "context_builder": gemini_service.context_builder.snapshot(),
+        "retrieval_index": gemini_service.retrieval_index.snapshot(),
+        "intent_router": gemini_service.intent_router.snapshot(),
+        "report_condenser": report_condenser.snapshot(),
+        "conversation_memory": conversation_memory.snapshot(),
+        "db_writer": db_writer.snapshot(),
+        "chat_store": chat_store.snapshot(),
+    }
+
 @router.get("/{patient_id}/history", response_model=List[ChatMessageSchema])
-def get_chat_history(
+async def get_chat_history(
     patient_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: str = None,
+    since_id: int = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    Historique, du plus ancien au plus récent. Sans limit ni cursor, le fil entier
+    (comme avant la pagination) ; avec limit ou cursor, paginé par X-Next-Cursor.
+    since_id : uniquement les messages postérieurs à ce message, pour qu'un client
+    ne recharge que les nouveaux messages.
+    """
+    if limit is None and cursor:
+        limit = HISTORY_PAGE_SIZE
     # Vérifier que le patient existe
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
+    if not await _patient_exists(db, patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Récupérer l'historique des messages
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.patient_id == patient_id
-    ).order_by(ChatMessage.created_at).all()
+    # Messages pas encore écrits, relevés avant la lecture en base (dédoublonnés par id)
+    pending = chat_store.pending(patient_id)
+    
+    # Récupérer l'historique des messages, du plus ancien au plus récent
+    query = select(ChatMessage).where(ChatMessage.patient_id == patient_id)
+    last_created_at = last_id = None
+    since_fallback = None
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            last_created_at = datetime.fromisoformat(last_created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    elif since_id is not None:
+        since = next((message.created_at for message in pending if message.id == since_id), None)
+        if since is None:
+            since = await db.scalar(select(ChatMessage.created_at).where(
+                ChatMessage.patient_id == patient_id,
+                ChatMessage.id == since_id
+            ))
+        if since:
+            last_created_at, last_id = since, since_id
+        else:
+            # Message supprimé entre-temps : les ids restent croissants
+            query = query.where(ChatMessage.id > since_id)
+            since_fallback = since_id
+    if last_created_at is not None:
+        query = query.where(
+            (ChatMessage.created_at > last_created_at) |
+            ((ChatMessage.created_at == last_created_at) & (ChatMessage.id > last_id))
+        )
+    query = query.order_by(ChatMessage.created_at, ChatMessage.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    messages = list((await db.scalars(query)).all())
+    
+    if pending:
+        stored = {message.id for message in messages}
+        for message in pending:
+            if message.id in stored:
+                continue
+            if last_created_at is not None and _message_key(message) <= (last_created_at, last_id):
+                continue
+            if since_fallback is not None and message.id <= since_fallback:
+                continue
+            messages.append(message)
+        messages = sorted(messages, key=_message_key)
+    if limit is None:
+        return messages
+    return page_items(messages, limit, response, lambda message: [message.created_at.isoformat(), message.id])
+
+@router.get("/{patient_id}/history/status", response_model=ChatHistoryStatus)
+async def get_chat_history_status(
+    patient_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Nombre de messages et dernier message du fil, pour le polling :
+    lu directement dans l'index (patient_id, created_at, id), plus les messages pas encore écrits
+    """
+    if not await _patient_exists(db, patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    pending = chat_store.pending(patient_id)
+    count = await db.scalar(select(func.count(ChatMessage.id)).where(ChatMessage.patient_id == patient_id))
+    last = (await db.execute(
+        select(ChatMessage.id, ChatMessage.created_at).where(
+            ChatMessage.patient_id == patient_id
+        ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(1)
+    )).first()
+    last_id, last_created_at = (last.id, last.created_at) if last else (None, None)
     
-    return messages
+    if pending:
+        stored = set(await db.scalars(
+            select(ChatMessage.id).where(ChatMessage.id.in_([message.id for message in pending]))
+        ))
+        unsaved = [message for message in pending if message.id not in stored]
+        count += len(unsaved)
+        if unsaved and (last_id is None or _message_key(unsaved[-1]) > (last_created_at, last_id)):
+            last_id, last_created_at = unsaved[-1].id, unsaved[-1].created_at
+    
+    return ChatHistoryStatus(
+        patient_id=patient_id,
+        count=count,
+        last_id=last_id,
+        last_created_at=last_created_at,
+        failed_ids=[message.id for message in chat_store.failed_messages(patient_id)]
+    )
 
 @router.delete("/{patient_id}/history")
-def clear_chat_history(
+async def clear_chat_history(
     patient_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Vérifier que le patient existe
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
+    if not await _patient_exists(db, patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Supprimer tous les messages pour ce patient
-    deleted_count = db.query(ChatMessage).filter(
+    # Écrire d'abord les messages en attente, pour qu'ils soient supprimés eux aussi
+    await db.commit()
+    await chat_store.flush()
+    # Un résumé en cours ne doit pas réécrire la mémoire après l'effacement
+    await conversation_memory.forget(patient_id)
+    chat_store.forget(patient_id)
+    
+    # Supprimer tous les messages pour ce patient, et la mémoire du fil
+    result = await db.execute(delete(ChatMessage).where(
         ChatMessage.patient_id == patient_id
-    ).delete()
+    ))
+    deleted_count = result.rowcount
+    await db.execute(delete(ChatMemory).where(ChatMemory.patient_id == patient_id))
     
-    db.commit()
+    await db.commit()
     
     return {"message": f"Deleted {deleted_count} messages", "deleted_count": deleted_count}
@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime
+import csv
+import io
+import json
+from ..config import settings
+from ..database import get_async_db, async_engine
+from ..models.database import Patient, Report, ChatMessage, Comorbidity, User, patient_comorbidity
+from ..services.chat_store import chat_store
+from ..routers.auth import get_current_user
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+PATIENT_FIELDS = ["id", "last_name", "first_name", "birth_date", "primary_condition",
+                  "current_status", "department", "created_at", "comorbidities"]
+REPORT_FIELDS = ["id", "patient_id", "type", "title", "date", "doctor", "summary", "full_text", "created_at"]
+CHAT_FIELDS = ["id", "patient_id", "sender", "message", "created_at"]
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+# Encodeur partagé : seules les dates passent par default()
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=_json_default)
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return "; ".join(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _encode(rows, fields, format: str) -> str:
+    if format == "ndjson":
+        return "".join(_json_encoder.encode(dict(zip(fields, row))) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+def _csv_header(fields) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue()
+
+async def _add_comorbidities(connection, rows) -> list:
+    """Comorbidités des patients d'un fragment, en une requête"""
+    names = {row[0]: [] for row in rows}
+    result = await connection.execute(
+        select(patient_comorbidity.c.patient_id, Comorbidity.name)
+        .join(Comorbidity, Comorbidity.id == patient_comorbidity.c.comorbidity_id)
+        .where(patient_comorbidity.c.patient_id.in_(names))
+        .order_by(Comorbidity.name)
+    )
+    for patient_id, name in result:
+        names[patient_id].append(name)
+    return [(*row, names[row[0]]) for row in rows]
+
+def _export(name: str, format: str, statement, fields, enrich=None) -> StreamingResponse:
+    """
+    Export en flux : les lignes sont lues par un curseur côté serveur (yield_per), par
+    fragments de export_chunk_size, et chaque fragment est écrit dès qu'il est lu.
+    Seuls des tuples (pas d'objets ORM) sont chargés : la mémoire ne dépend pas du volume.
+    """
+    async def rows_stream():
+        # Connexion propre au flux : la session de la requête est fermée avant l'envoi du corps
+        async with async_engine.connect() as connection:
+            if format == "csv":
+                yield _csv_header(fields)
+            result = await connection.stream(statement.execution_options(yield_per=settings.export_chunk_size))
+            async for rows in result.partitions():
+                if enrich is not None:
+                    rows = await enrich(connection, rows)
+                yield _encode(rows, fields, format)
+
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{format}"', "X-Accel-Buffering": "no"}
+    return StreamingResponse(rows_stream(), media_type=MEDIA_TYPES[format], headers=headers)
+
+@router.get("/patients")
+async def export_patients(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    current_user: User = Depends(get_current_user)
+):
+    """Tous les patients (avec leurs comorbidités), par id croissant"""
+    statement = select(*(getattr(Patient, field) for field in PATIENT_FIELDS[:-1])).order_by(Patient.id)
+    return _export("patients", format, statement, PATIENT_FIELDS, enrich=_add_comorbidities)
+
+@router.get("/reports")
+async def export_reports(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    patient_id: str = None,
+    start_date: date = None,
+    end_date: date = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Rapports, filtrés par patient et par période, dans l'ordre de l'index (patient, date)"""
+    statement = select(*(getattr(Report, field) for field in REPORT_FIELDS)) \
+        .order_by(Report.patient_id, Report.date, Report.id)
+    if patient_id:
+        statement = statement.where(Report.patient_id == patient_id)
+    if start_date:
+        statement = statement.where(Report.date >= start_date)
+    if end_date:
+        statement = statement.where(Report.date <= end_date)
+    return _export("reports", format, statement, REPORT_FIELDS)
+
+@router.get("/chat")
+async def export_chat_history(
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    patient_id: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Historique du chat d'un patient, ou de tous les patients, dans l'ordre chronologique"""
+    if patient_id:
+        if await db.scalar(select(Patient.id).where(Patient.id == patient_id)) is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        await db.commit()
+    # Messages enregistrés en différé : écrits avant la lecture pour que l'export soit complet
+    await chat_store.flush()
+
+    statement = select(*(getattr(ChatMessage, field) for field in CHAT_FIELDS)) \
+        .order_by(ChatMessage.patient_id, ChatMessage.created_at, ChatMessage.id)
+    if patient_id:
+        statement = statement.where(ChatMessage.patient_id == patient_id)
+    filename = f"chat_{patient_id}" if patient_id else "chat"
+    return _export(filename, format, statement, CHAT_FIELDS)
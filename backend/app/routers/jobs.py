@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db, AsyncSessionLocal
+from ..models.database import Patient, User
+from ..schemas.schemas import Job, JobCreate
+from ..services.job_queue import job_queue, PermanentJobError, FINISHED
+from ..routers.auth import get_current_user
+from ..routers.chat import gemini_service, _load_patient_for_chat, _sse, SSE_HEADERS
+import asyncio
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Intervalle des commentaires SSE envoyés pendant l'attente (évite la coupure par un proxy)
+KEEPALIVE_SECONDS = 15.0
+
+async def _load_job_patient(job):
+    """Patient et rapports de la période du job, chargés puis session fermée avant l'appel à Gemini"""
+    async with AsyncSessionLocal() as db:
+        patient = await _load_patient_for_chat(db, job.patient_id, job.params.get("date_filter"))
+    if patient is None:
+        raise PermanentJobError("Patient not found")
+    return patient
+
+async def _run_patient_question(job):
+    patient = await _load_job_patient(job)
+    date_filter = job.params.get("date_filter")
+    message = job.params["message"]
+    context = gemini_service.build_patient_context(patient, date_filter, message)
+    return await gemini_service.answer_patient_question(
+        patient, message, date_filter, use_cache=job.params.get("use_cache", True), context=context
+    )
+
+async def _run_report_analysis(job):
+    patient = await _load_job_patient(job)
+    return await gemini_service.analyze_patient_reports(
+        patient, job.params.get("date_filter"), job.params.get("use_cache", True)
+    )
+
+job_queue.register("patient_question", _run_patient_question)
+job_queue.register("report_analysis", _run_report_analysis)
+
+@router.post("/", response_model=Job, status_code=202)
+async def create_job(
+    job_request: JobCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Enregistre l'analyse et renvoie le job aussitôt ; le résultat se lit sur GET /jobs/{id}"""
+    if job_request.kind == "patient_question" and not job_request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    if await db.scalar(select(Patient.id).where(Patient.id == job_request.patient_id)) is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    await db.commit()
+
+    params = {
+        "date_filter": job_request.date_filter.model_dump() if job_request.date_filter else None,
+        "use_cache": job_request.use_cache,
+    }
+    if job_request.message:
+        params["message"] = job_request.message
+    return await job_queue.submit(
+        job_request.kind, job_request.patient_id, params, job_request.priority, current_user.id
+    )
+
+@router.get("/stats")
+def get_job_stats(current_user: User = Depends(get_current_user)):
+    """File d'attente, jobs en cours, réussis, échoués et réessayés"""
+    return job_queue.snapshot()
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    État du job en SSE : un événement `status` à chaque changement (mis en file, démarré,
+    réessai prévu), puis `done` avec le résultat ou l'erreur, et le flux se termine
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last = None
+        while True:
+            # Relevé avant la lecture : un changement entre les deux n'est pas perdu
+            changed = job_queue.changed(job_id)
+            job = await job_queue.get(job_id)
+            state = Job.model_validate(job).model_dump(mode="json")
+            if state["status"] in FINISHED:
+                yield _sse(state, event="done")
+                return
+            if state != last:
+                last = state
+                yield _sse(state, event="status")
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,79 +1,175 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
-from ..database import get_db
+from datetime import date
+from ..database import get_async_db
 from ..models.database import Patient, Report, Comorbidity
-from ..schemas.schemas import Patient as PatientSchema, PatientCreate, Report as ReportSchema
+from ..schemas.schemas import Patient as PatientSchema, PatientCreate, PatientSummary, Report as ReportSchema
 from ..routers.auth import get_current_user
 from ..models.database import User
+from ..pagination import decode_cursor, paginate
+from ..services.search import patient_id_filter
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+def _apply_search(query, db: AsyncSession, search: str = None):
+    if search:
+        # Fragments d'id ou de nom, et index plein texte (préfixes de noms, d'id et de diagnostic)
+        criterion = patient_id_filter(db, search)
+        if criterion is not None:
+            query = query.where(criterion)
+    return query
+
+async def _load_patient(db: AsyncSession, patient_id: str, populate_existing: bool = False):
+    query = select(Patient).options(
+        selectinload(Patient.reports),
+        selectinload(Patient.comorbidities)
+    ).where(Patient.id == patient_id)
+    if populate_existing:
+        query = query.execution_options(populate_existing=True)
+    return await db.scalar(query)
+
+async def _page_patients(db: AsyncSession, query, response: Response, cursor: str = None,
+                         skip: int = 0, limit: int = 100):
+    """
+    Pagination par curseur sur l'id du patient : le coût d'une page ne dépend pas de sa position.
+    skip reste accepté pour les anciens clients.
+    """
+    query = query.order_by(Patient.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        query = query.where(Patient.id > last_id)
+    elif skip:
+        query = query.offset(skip)
+    return await paginate(db, query, limit, response, lambda patient: [patient.id])
+
 @router.get("/", response_model=List[PatientSchema])
-def get_patients(
+async def get_patients(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=1000),
     search: str = None,
-    db: Session = Depends(get_db),
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Patient).options(
-        joinedload(Patient.reports),
-        joinedload(Patient.comorbidities)
+    # selectinload : une requête par relation au lieu d'un produit cartésien
+    query = select(Patient).options(
+        selectinload(Patient.reports),
+        selectinload(Patient.comorbidities)
     )
+    query = _apply_search(query, db, search)
     
-    if search:
-        search_filter = f"%{search}%"
-        query = query.filter(
-            (Patient.first_name.ilike(search_filter)) |
-            (Patient.last_name.ilike(search_filter)) |
-            (Patient.id.ilike(search_filter))
-        )
+    return await _page_patients(db, query, response, cursor, skip, limit)
+
+@router.get("/summary", response_model=List[PatientSummary])
+async def get_patients_summary(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    search: str = None,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Liste allégée pour la recherche : données démographiques, noms des comorbidités
+    et nombre de rapports par type, sans le texte des rapports
+    """
+    query = select(Patient).options(selectinload(Patient.comorbidities))
+    query = _apply_search(query, db, search)
+    patients = await _page_patients(db, query, response, cursor, skip, limit)
     
-    patients = query.offset(skip).limit(limit).all()
-    return patients
+    # Comptage agrégé des rapports : une seule requête pour toute la page
+    report_stats = {}
+    if patients:
+        rows = (await db.execute(
+            select(
+                Report.patient_id,
+                Report.type,
+                func.count(Report.id),
+                func.max(Report.date)
+            ).where(
+                Report.patient_id.in_([patient.id for patient in patients])
+            ).group_by(Report.patient_id, Report.type)
+        )).all()
+        for patient_id, report_type, count, latest in rows:
+            report_stats.setdefault(patient_id, []).append((report_type, count, latest))
+    
+    summaries = []
+    for patient in patients:
+        stats = report_stats.get(patient.id, [])
+        latest_dates = [latest for _, _, latest in stats if latest]
+        summaries.append(PatientSummary(
+            id=patient.id,
+            last_name=patient.last_name,
+            first_name=patient.first_name,
+            birth_date=patient.birth_date,
+            primary_condition=patient.primary_condition,
+            current_status=patient.current_status,
+            department=patient.department,
+            created_at=patient.created_at,
+            comorbidities=[comorbidity.name for comorbidity in patient.comorbidities],
+            report_count=sum(count for _, count, _ in stats),
+            report_counts={report_type: count for report_type, count, _ in stats},
+            latest_report_date=max(latest_dates) if latest_dates else None,
+        ))
+    return summaries
 
 @router.get("/{patient_id}", response_model=PatientSchema)
-def get_patient(
+async def get_patient(
     patient_id: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    patient = db.query(Patient).options(
-        joinedload(Patient.reports),
-        joinedload(Patient.comorbidities)
-    ).filter(Patient.id == patient_id).first()
-    
+    patient = await _load_patient(db, patient_id)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
 
 @router.post("/", response_model=PatientSchema)
-def create_patient(
+async def create_patient(
     patient: PatientCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Vérifier si le patient existe déjà
-    existing_patient = db.query(Patient).filter(Patient.id == patient.id).first()
+    existing_patient = await db.get(Patient, patient.id)
     if existing_patient:
         raise HTTPException(status_code=400, detail="Patient with this ID already exists")
     
     db_patient = Patient(**patient.dict())
     db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
-    return db_patient
+    await db.commit()
+    # Relations chargées explicitement : pas de chargement paresseux en asynchrone
+    return await _load_patient(db, db_patient.id, populate_existing=True)
 
 @router.get("/{patient_id}/reports", response_model=List[ReportSchema])
-def get_patient_reports(
+async def get_patient_reports(
     patient_id: str, 
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.scalar(select(Patient.id).where(Patient.id == patient_id))
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    reports = db.query(Report).filter(Report.patient_id == patient_id).all()
-    return reports
+    # Rapports du plus récent au plus ancien ; l'id départage les rapports du même jour
+    query = select(Report).where(Report.patient_id == patient_id)
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, 2)
+        try:
+            last_date = date.fromisoformat(last_date)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(
+            (Report.date < last_date) |
+            ((Report.date == last_date) & (Report.id < last_id))
+        )
+    query = query.order_by(Report.date.desc(), Report.id.desc())
+    return await paginate(db, query, limit, response, lambda report: [report.date.isoformat(), report.id])
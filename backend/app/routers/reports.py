@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List
+import json
+from ..config import settings
+from ..database import get_async_db, report_condenser
+from ..models.database import User
+from ..schemas.schemas import ReportIngestResult
+from ..services.report_ingest import ReportIngestion, ndjson_lines
+from ..routers.auth import get_current_user
+from ..routers.chat import gemini_service
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+def _update_derived_indexes(reports):
+    """Ajout incrémental des nouveaux rapports aux index des patients déjà chargés"""
+    by_patient = {}
+    for report in reports:
+        by_patient.setdefault(report.patient_id, []).append(report)
+    for patient_id, patient_reports in by_patient.items():
+        gemini_service.retrieval_index.add_reports(patient_id, patient_reports)
+    # Nouveaux rapports à condenser : passage de fond sans attendre l'intervalle
+    report_condenser.wake()
+
+def _ingestion(db: AsyncSession) -> ReportIngestion:
+    return ReportIngestion(db, settings.report_ingest_chunk_size, on_inserted=_update_derived_indexes)
+
+@router.post("/bulk", response_model=ReportIngestResult)
+async def bulk_create_reports(
+    reports: List[Any],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Création en masse : liste JSON de rapports (format ReportCreate, id facultatif).
+    Les lignes invalides sont ignorées et rapportées, les autres sont insérées.
+    """
+    ingestion = _ingestion(db)
+    try:
+        for row, data in enumerate(reports, 1):
+            await ingestion.add(row, data)
+        return await ingestion.finish()
+    finally:
+        ingestion.cancel()
+
+@router.post("/ingest", response_model=ReportIngestResult)
+async def ingest_reports(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Ingestion en flux NDJSON (application/x-ndjson) : un rapport par ligne, lu et inséré
+    au fil de l'envoi, sans charger tout le fichier en mémoire
+    """
+    ingestion = _ingestion(db)
+    row = 0
+
+    async def ingest_line(line: bytes):
+        nonlocal row
+        row += 1
+        if not line.strip():
+            return
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            ingestion.received += 1
+            ingestion.error(row, None, f"Invalid JSON: {e}")
+            return
+        await ingestion.add(row, data)
+
+    try:
+        async for line in ndjson_lines(request.stream()):
+            await ingest_line(line)
+        return await ingestion.finish()
+    finally:
+        ingestion.cancel()
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models.database import User
+from ..schemas.schemas import SearchResults
+from ..services.search import search_patients, search_reports
+from ..routers.auth import get_current_user
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=SearchResults)
+async def search(
+    q: str,
+    scope: str = Query("all", pattern="^(all|patients|reports)$"),
+    patient_id: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Recherche plein texte classée sur les patients (noms, id, diagnostic) et les rapports
+    (titre, résumé, texte complet), avec extraits surlignés par <mark>
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query is required")
+    
+    patients = []
+    reports = []
+    if scope in ("all", "patients") and not patient_id:
+        patients = await search_patients(db, q, limit)
+    if scope in ("all", "reports"):
+        reports = await search_reports(db, q, limit, patient_id)
+    return SearchResults(query=q, patients=patients, reports=reports)
@@ -1,6 +1,26 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, field_serializer, field_validator
+from typing import Dict, List, Optional
+from datetime import date, datetime
+
+def parse_birth_date(value):
+    """Accepte le format allemand 'JJ.MM.AAAA' (format historique de l'API) ou ISO"""
+    if isinstance(value, str) and "." in value:
+        return datetime.strptime(value.strip(), "%d.%m.%Y").date()
+    return value
+
+# Fachbereiche connus : variantes d'écriture ramenées au nom canonique
+DEPARTMENTS = ["Chirurgie", "Onkologie", "Kardiologie", "Orthopädie"]
+_DEPARTMENT_ALIASES = {name.casefold(): name for name in DEPARTMENTS}
+_DEPARTMENT_ALIASES.update({"orthopaedie": "Orthopädie", "orthopadie": "Orthopädie", "orthopedie": "Orthopädie"})
+
+def normalize_department(value):
+    """Nom canonique du Fachbereich ('kardiologie ' -> 'Kardiologie'), None si vide"""
+    if value is None:
+        return None
+    value = " ".join(value.split())
+    if not value:
+        return None
+    return _DEPARTMENT_ALIASES.get(value.casefold(), value)
 
 class UserBase(BaseModel):
     email: str
@@ -36,12 +56,14 @@ class Comorbidity(ComorbidityBase):
 class ReportBase(BaseModel):
     type: str
     title: str
-    date: str
+    date: date
     doctor: str
     summary: Optional[str] = None
     full_text: Optional[str] = None
 
 class ReportCreate(ReportBase):
+    # Généré (uuid) s'il n'est pas fourni
+    id: Optional[str] = None
     patient_id: str
 
 class Report(ReportBase):
@@ -56,9 +78,24 @@ class PatientBase(BaseModel):
     id: str
     last_name: str
     first_name: str
-    birth_date: str
+    birth_date: date
     primary_condition: Optional[str] = None
     current_status: Optional[str] = None
+    department: Optional[str] = None
+
+    @field_validator("birth_date", mode="before")
+    @classmethod
+    def _parse_birth_date(cls, value):
+        return parse_birth_date(value)
+
+    @field_validator("department")
+    @classmethod
+    def _normalize_department(cls, value):
+        return normalize_department(value)
+
+    @field_serializer("birth_date", when_used="json")
+    def _serialize_birth_date(self, value: date) -> str:
+        return value.strftime("%d.%m.%Y")
 
 class PatientCreate(PatientBase):
     pass
@@ -71,6 +108,51 @@ class Patient(PatientBase):
     class Config:
         from_attributes = True
 
+class PatientSummary(PatientBase):
+    """Patient pour la liste de recherche : sans le contenu des rapports"""
+    created_at: datetime
+    comorbidities: List[str] = []
+    report_count: int = 0
+    report_counts: Dict[str, int] = {}
+    latest_report_date: Optional[date] = None
+
+class PatientSearchHit(BaseModel):
+    id: str
+    first_name: str
+    last_name: str
+    primary_condition: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+class ReportSearchHit(BaseModel):
+    id: str
+    patient_id: str
+    type: str
+    title: str
+    date: date
+    snippet: Optional[str] = None
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    patients: List[PatientSearchHit] = []
+    reports: List[ReportSearchHit] = []
+
+class ReportIngestError(BaseModel):
+    row: int
+    id: Optional[str] = None
+    error: str
+
+class ReportIngestResult(BaseModel):
+    """Bilan d'une ingestion de rapports ; row : numéro de ligne (à partir de 1)"""
+    received: int
+    inserted: int
+    failed: int
+    errors: List[ReportIngestError] = []
+    errors_truncated: bool = False
+    elapsed_s: float
+    reports_per_s: float
+
 class ChatMessageBase(BaseModel):
     patient_id: str
     sender: str
@@ -83,6 +165,14 @@ class ChatMessage(ChatMessageBase):
     class Config:
         from_attributes = True
 
+class ChatHistoryStatus(BaseModel):
+    patient_id: str
+    count: int
+    last_id: Optional[int] = None
+    last_created_at: Optional[datetime] = None
+    # Messages affichés mais dont l'écriture a définitivement échoué
+    failed_ids: List[int] = []
+
 class DateFilter(BaseModel):
     startDate: str
     endDate: str
@@ -91,7 +181,62 @@ class ChatRequest(BaseModel):
     message: str
     patient_id: str
     date_filter: Optional[DateFilter] = None
+    use_cache: bool = True
+
+class CohortRequest(BaseModel):
+    """Cohorte à analyser : liste d'ids, ou filtre par Fachbereich et/ou période des rapports"""
+    patient_ids: Optional[List[str]] = None
+    department: Optional[str] = None
+    date_filter: Optional[DateFilter] = None
+    use_cache: bool = True
+
+    @field_validator("department")
+    @classmethod
+    def _normalize_department(cls, value):
+        return normalize_department(value)
+
+class JobCreate(BaseModel):
+    """Analyse à exécuter en arrière-plan : question sur un patient, ou analyse de ses rapports"""
+    kind: str = Field("patient_question", pattern="^(patient_question|report_analysis)$")
+    patient_id: str
+    message: Optional[str] = None
+    date_filter: Optional[DateFilter] = None
+    use_cache: bool = True
+    priority: int = Field(0, ge=0, le=9)
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    patient_id: Optional[str] = None
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    run_after: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ContextInfo(BaseModel):
+    tokens: int
+    characters: int
+    token_budget: int
+    reports_total: int
+    reports_full: int
+    reports_summary: int
+    reports_omitted: int
+    reports_excerpt: int = 0
+    reports_abstract: int = 0
+    history_messages: int = 0
+    history_summarized: bool = False
+    history_tokens: int = 0
 
 class ChatResponse(BaseModel):
     response: str
     message_id: int
+    context: Optional[ContextInfo] = None
@@ -0,0 +1,82 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+def patient_content_version(patient) -> str:
+    """
+    Empreinte du contenu d'un patient utilisé dans le prompt (données, comorbidités, rapports).
+    Tout ajout de rapport ou changement de comorbidité produit une nouvelle version.
+    """
+    digest = hashlib.sha1()
+    for value in (patient.id, patient.primary_condition, patient.current_status, patient.birth_date):
+        digest.update(f"{value}\x1f".encode("utf-8"))
+    for name in sorted(comorbidity.name for comorbidity in patient.comorbidities):
+        digest.update(f"c:{name}\x1f".encode("utf-8"))
+    for report in sorted(patient.reports, key=lambda r: r.id):
+        for value in (report.id, report.type, report.title, report.date, report.doctor, report.summary, report.full_text):
+            digest.update(f"{value}\x1f".encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+def normalize_question(question: str) -> str:
+    """Minuscules, espaces normalisés, ponctuation finale retirée"""
+    return re.sub(r"\s+", " ", question.casefold()).strip().rstrip("?!. ")
+
+def make_answer_key(patient, question: str, date_filter: dict = None, history_digest: str = "") -> str:
+    """history_digest : empreinte du fil de discussion, dès qu'il n'est pas vide (il fait partie du prompt)"""
+    period = ""
+    if date_filter:
+        period = f"{date_filter.get('startDate') or ''}|{date_filter.get('endDate') or ''}"
+    return "|".join([patient.id, patient_content_version(patient), period, history_digest, normalize_question(question)])
+
+class AnswerCache:
+    """
+    Cache LRU avec durée de vie des réponses de l'IA
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
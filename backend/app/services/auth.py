@@ -1,9 +1,16 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from sqlalchemy import event, inspect
+import asyncio
+import time
 from ..config import settings
+from ..models.database import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -11,6 +18,105 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class HashingBusyError(Exception):
+    """File d'attente du hachage des mots de passe pleine"""
+
+class PasswordHasher:
+    """
+    Hachage bcrypt dans un pool de threads dédié, séparé du pool des routes synchrones.
+    Au-delà de queue_limit opérations en attente, les nouvelles demandes sont refusées
+    immédiatement au lieu de s'accumuler.
+    """
+    def __init__(self, workers: int, queue_limit: int, window: int = 1000):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._hash_times = deque(maxlen=window)
+        self._wait_times = deque(maxlen=window)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def _run(self, function, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HashingBusyError("Trop de demandes d'authentification en cours, veuillez réessayer")
+
+        submitted_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self._wait_times.append(started_at - submitted_at)
+                self._hash_times.append(time.perf_counter() - started_at)
+
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def stop(self):
+        """
+        Arrêt de l'application : les hachages en cours se terminent, ceux en attente sont
+        annulés ; l'attente des threads se fait hors de la boucle d'événements
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._executor.shutdown(wait=True, cancel_futures=True)
+        )
+
+    def snapshot(self) -> dict:
+        hash_times = sorted(self._hash_times)
+        wait_times = sorted(self._wait_times)
+
+        def percentile(values, q):
+            return round(1000 * values[min(len(values) - 1, int(q * (len(values) - 1)))], 1) if values else 0.0
+
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "bcrypt_rounds": settings.bcrypt_rounds,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(self.pending - self.workers, 0),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_ms": {"p50": percentile(hash_times, 0.50), "p95": percentile(hash_times, 0.95)},
+            "queue_wait_ms": {"p50": percentile(wait_times, 0.50), "p95": percentile(wait_times, 0.95)},
+        }
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_limit)
+
+def user_is_active(user) -> bool:
+    # is_active est stocké dans une colonne texte ('1', 'true', ...)
+    value = user.is_active
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+def user_token_claims(user) -> dict:
+    """
+    Données du jeton : sujet, id utilisateur, état actif et version des identifiants.
+    Le contenu d'un JWT est lisible par le client : rien qui dérive du mot de passe.
+    """
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "act": user_is_active(user),
+        "ver": user.token_version or 0,
+    }
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -21,12 +127,79 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-def verify_token(token: str):
+def decode_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
+
+class UserCache:
+    """
+    Cache des utilisateurs authentifiés, par sujet du jeton (email), borné en taille et en durée
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str):
+        entry = self._entries.get(subject)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            self._entries.pop(subject, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, subject: str, user):
+        if self.max_entries <= 0:
+            return
+        self._entries[subject] = (time.monotonic(), user)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        self._entries.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+user_cache = UserCache(settings.user_cache_max_entries, settings.user_cache_ttl)
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target):
+    """Nouveau mot de passe : les jetons émis avec l'ancien ne sont plus acceptés"""
+    if inspect(target).attrs.hashed_password.history.has_changes():
+        target.token_version = (target.token_version or 0) + 1
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Désactivation, changement de mot de passe ou d'email : l'entrée en cache ne doit plus servir"""
+    user_cache.invalidate(target.email)
+    for previous_email in inspect(target).attrs.email.history.deleted or ():
+        user_cache.invalidate(previous_email)
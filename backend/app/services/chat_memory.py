@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import re
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import select
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.database import ChatMemory, ChatMessage
+from .chat_store import chat_store
+from .context_builder import estimate_tokens
+
+# Messages résumés au plus par appel au modèle (rattrapage d'un long fil existant)
+MAX_FOLD_MESSAGES = 40
+
+SENDER_LABELS = {"user": "Arzt", "ai": "Assistent"}
+
+# Question de suivi : renvoi aux échanges précédents ("Und davor?", pronom "sie", "ihr
+# Befund", "Was bedeutet das ...") ou question trop courte pour se comprendre seule.
+# Appliquée à la question en minuscules ; dans le doute, la question compte comme un suivi
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(?:und|aber|also|oder|was ist mit|wie ist es mit|wie sieht es mit)\b"
+    r"|\b(?:dazu|davon|darüber|dabei|damit|dafür|dagegen|daran|darauf|dadurch|dort|damals"
+    r"|dieselbe[rnm]?|vorhin|zuvor|oben|erwähnt\w*|genannt\w*|vorherige\w*"
+    r"|er|sie|ihn|ihm|ihr\w*|sein\w*|außerdem|ebenfalls|stattdessen|genauer)\b"
+    # Démonstratif devant un nom, sauf une période ("in diesem Jahr")
+    r"|\bdiese[rsmn]?\b(?!\s+(?:jahr|monat|woche|quartal|tag)\w*)"
+)
+# Appliquée à la question telle quelle : "das"/"dies" pronom (suivi d'un mot en minuscules
+# ou de la fin de phrase), pas l'article d'un nom ("das Staging")
+DEMONSTRATIVE_PATTERN = re.compile(r"\b(?:[Dd]as|[Dd]ies)\b(?=\s+[a-zäöüß]|\s*[?.!,]|\s*$)")
+FOLLOW_UP_MAX_WORDS = 3
+
+def is_follow_up(question: str) -> bool:
+    text = question.lower()
+    return (len(text.split()) <= FOLLOW_UP_MAX_WORDS or FOLLOW_UP_PATTERN.search(text) is not None
+            or DEMONSTRATIVE_PATTERN.search(question) is not None)
+
+def _message_key(message) -> tuple:
+    return (message.created_at, message.id)
+
+class ConversationHistory:
+    """Mémoire d'un fil prête pour le prompt : résumé des échanges anciens et derniers messages"""
+    def __init__(self, summary: str = None, messages: List[ChatMessage] = (), message_max_chars: int = 2000):
+        self.summary = summary
+        self.messages = list(messages)
+        parts = []
+        if summary:
+            parts.append(f"Zusammenfassung des bisherigen Gesprächs:\n{summary}\n")
+        if self.messages:
+            parts.append("Letzte Nachrichten:")
+            for message in self.messages:
+                text = message.message
+                if len(text) > message_max_chars:
+                    text = text[:message_max_chars] + " […]"
+                parts.append(f"{SENDER_LABELS.get(message.sender, message.sender)}: {text}")
+        self.text = "\n".join(parts)
+        self.tokens = estimate_tokens(self.text) if self.text else 0
+
+    @property
+    def digest(self) -> str:
+        """Empreinte du fil, pour la clé du cache des réponses ('' sans historique)"""
+        if not self.text:
+            return ""
+        return hashlib.sha1(self.text.encode("utf-8")).hexdigest()[:16]
+
+    def as_metadata(self) -> dict:
+        return {
+            "history_messages": len(self.messages),
+            "history_summarized": self.summary is not None,
+            "history_tokens": self.tokens,
+        }
+
+class ConversationMemory:
+    """
+    Mémoire bornée des fils du chat : le prompt reçoit le résumé des échanges anciens
+    (table chat_memories) et les messages pas encore résumés, soit au plus
+    turns + fold_turns échanges. Dès que fold_turns échanges dépassent les `turns`
+    derniers, ils sont intégrés au résumé en tâche de fond (summarize(résumé, messages)),
+    sans allonger la réponse en cours. Le coût du prompt ne dépend pas de la longueur du fil.
+    """
+    def __init__(self, session_factory, store, turns: int = 3, fold_turns: int = 3,
+                 summary_max_tokens: int = 400, message_max_chars: int = 2000):
+        self.session_factory = session_factory
+        self.store = store
+        self.turns = turns
+        self.fold_turns = fold_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.message_max_chars = message_max_chars
+        self._folds: Dict[str, asyncio.Task] = {}
+        self.loads = 0
+        self.threaded_questions = 0
+        self.follow_ups = 0
+        self.folds = 0
+        self.folded_messages = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_history_tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.turns > 0
+
+    @property
+    def window(self) -> int:
+        """Messages gardés tels quels (deux par échange)"""
+        return 2 * self.turns
+
+    async def _unsummarized(self, db, patient_id: str, memory, limit: int, newest: bool) -> List[ChatMessage]:
+        """
+        Messages postérieurs au résumé, enregistrés ou encore en attente d'écriture :
+        les `limit` plus récents (newest) ou les plus anciens, du plus ancien au plus récent
+        """
+        query = select(ChatMessage).where(ChatMessage.patient_id == patient_id)
+        after = None
+        if memory is not None and memory.summarized_until_at is not None:
+            after = (memory.summarized_until_at, memory.summarized_until_id)
+            query = query.where(
+                (ChatMessage.created_at > after[0]) |
+                ((ChatMessage.created_at == after[0]) & (ChatMessage.id > after[1]))
+            )
+        if newest:
+            query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        else:
+            query = query.order_by(ChatMessage.created_at, ChatMessage.id)
+        messages = {message.id: message for message in await db.scalars(query.limit(limit))}
+        for message in self.store.pending(patient_id):
+            if after is None or _message_key(message) > after:
+                messages.setdefault(message.id, message)
+        ordered = sorted(messages.values(), key=_message_key)
+        return ordered[-limit:] if newest else ordered[:limit]
+
+    async def load(self, patient_id: str, exclude_id: int = None, question: str = None) -> ConversationHistory:
+        """
+        Mémoire du fil avant la question en cours (exclude_id : message de la question).
+        question : compte les questions de suivi parmi celles posées dans un fil existant
+        """
+        if not self.enabled:
+            return ConversationHistory()
+        limit = self.window + 2 * self.fold_turns
+        async with self.session_factory() as db:
+            memory = await db.get(ChatMemory, patient_id)
+            messages = await self._unsummarized(db, patient_id, memory, limit + 1, newest=True)
+        messages = [message for message in messages if message.id != exclude_id][-limit:]
+        history = ConversationHistory(memory.summary if memory else None, messages, self.message_max_chars)
+        self.loads += 1
+        if question is not None and history.text:
+            self.threaded_questions += 1
+            self.follow_ups += is_follow_up(question)
+        self.max_history_tokens = max(self.max_history_tokens, history.tokens)
+        return history
+
+    def schedule_fold(self, patient_id: str, summarize):
+        """Intègre au résumé les échanges sortis de la fenêtre, en tâche de fond (une par patient)"""
+        if not self.enabled or patient_id in self._folds:
+            return
+        task = asyncio.get_running_loop().create_task(self._fold(patient_id, summarize))
+        self._folds[patient_id] = task
+        task.add_done_callback(lambda _: self._folds.pop(patient_id, None))
+
+    async def _fold(self, patient_id: str, summarize):
+        try:
+            while True:
+                async with self.session_factory() as db:
+                    memory = await db.get(ChatMemory, patient_id)
+                    messages = await self._unsummarized(
+                        db, patient_id, memory, MAX_FOLD_MESSAGES + self.window, newest=False
+                    )
+                to_fold = messages[:-self.window] if self.window else messages
+                if len(to_fold) < 2 * self.fold_turns:
+                    return
+                to_fold = to_fold[:MAX_FOLD_MESSAGES]
+                summary = await summarize(memory.summary if memory else None, to_fold)
+                # Borne la taille du résumé même si le modèle dépasse la consigne
+                summary = summary.strip()[:4 * self.summary_max_tokens]
+                async with self.session_factory() as db:
+                    memory = await db.get(ChatMemory, patient_id)
+                    if memory is None:
+                        memory = ChatMemory(patient_id=patient_id, summarized_messages=0)
+                        db.add(memory)
+                    memory.summary = summary
+                    memory.summarized_until_at = to_fold[-1].created_at
+                    memory.summarized_until_id = to_fold[-1].id
+                    memory.summarized_messages += len(to_fold)
+                    memory.updated_at = datetime.utcnow()
+                    await db.commit()
+                self.folds += 1
+                self.folded_messages += len(to_fold)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Résumé retenté après le prochain échange ; les messages restent dans le prompt
+            self.errors += 1
+            self.last_error = str(e)
+
+    async def forget(self, patient_id: str):
+        """Historique effacé : arrête le résumé en cours (le résumé est supprimé avec les messages)"""
+        task = self._folds.get(patient_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def stop(self):
+        tasks = list(self._folds.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "turns": self.turns,
+            "loads": self.loads,
+            "threaded_questions": self.threaded_questions,
+            "follow_ups": self.follow_ups,
+            "folds": self.folds,
+            "folded_messages": self.folded_messages,
+            "folds_in_progress": len(self._folds),
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "max_history_tokens": self.max_history_tokens,
+        }
+
+conversation_memory = ConversationMemory(
+    AsyncSessionLocal, chat_store, settings.chat_memory_turns, settings.chat_memory_fold_turns,
+    settings.chat_memory_summary_max_tokens, settings.chat_memory_message_max_chars
+)
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from ..config import settings
+from ..database import AsyncSessionLocal, db_writer
+from ..models.database import ChatMessage, IdSequence
+
+class IdAllocator:
+    """
+    Identifiants attribués avant l'écriture en base : un bloc de block_size valeurs
+    est réservé en une transaction dans id_sequences, puis distribué en mémoire
+    """
+    def __init__(self, session_factory, name: str, column, block_size: int = 100):
+        self.session_factory = session_factory
+        self.name = name
+        self.column = column
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+        self.blocks = 0
+
+    async def next_id(self) -> int:
+        if self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    await self._reserve_block()
+        value = self._next
+        self._next += 1
+        return value
+
+    async def _reserve_block(self):
+        while True:
+            async with self.session_factory() as db:
+                # Incrément atomique : sûr avec plusieurs processus sur la même base
+                end = await db.scalar(
+                    update(IdSequence)
+                    .where(IdSequence.name == self.name)
+                    .values(next_value=IdSequence.next_value + self.block_size)
+                    .returning(IdSequence.next_value)
+                )
+                if end is None:
+                    # Première utilisation : reprend après le plus grand id existant
+                    start = (await db.scalar(select(func.max(self.column))) or 0) + 1
+                    end = start + self.block_size
+                    db.add(IdSequence(name=self.name, next_value=end))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Ligne créée au même moment par un autre processus : l'incrément est refait
+                    continue
+            break
+        self._next, self._end = end - self.block_size, end
+        self.blocks += 1
+
+class ChatMessageStore:
+    """
+    Enregistrement différé (write-behind) des messages du chat : l'id est attribué
+    immédiatement, l'insertion est confiée à l'écrivain de la base et regroupée avec
+    les autres. Les messages pas encore écrits restent lisibles via pending().
+
+    Une écriture en échec est remise en file jusqu'à `retries` fois, après un délai doublé
+    à chaque essai. Un message définitivement perdu (déjà affiché au client) est signalé
+    par failed() jusqu'à l'effacement de l'historique.
+    """
+    def __init__(self, writer, allocator: IdAllocator, retries: int = 3, retry_delay: float = 0.5):
+        self.writer = writer
+        self.allocator = allocator
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._pending: Dict[str, Dict[int, ChatMessage]] = {}
+        self._failed: Dict[str, Dict[int, ChatMessage]] = {}
+        self._retry_tasks = set()
+        self.saved = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def save(self, patient_id: str, sender: str, message: str) -> int:
+        message_id = await self.allocator.next_id()
+        values = {
+            "id": message_id,
+            "patient_id": patient_id,
+            "sender": sender,
+            "message": message,
+            "created_at": datetime.utcnow(),
+        }
+        self._pending.setdefault(patient_id, {})[message_id] = ChatMessage(**values)
+        await self._enqueue(patient_id, values, 1)
+        return message_id
+
+    async def _enqueue(self, patient_id: str, values: dict, attempt: int):
+        async def insert(db):
+            db.add(ChatMessage(**values))
+            return values["id"]
+
+        await self.writer.enqueue(insert, done=lambda error: self._written(patient_id, values, attempt, error))
+
+    def _written(self, patient_id: str, values: dict, attempt: int, error):
+        if error is not None and attempt <= self.retries and self.writer.running:
+            # Le message reste dans pending() pendant l'attente du nouvel essai
+            self.retried += 1
+            task = asyncio.get_running_loop().create_task(self._retry(patient_id, values, attempt))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+            return
+        message = None
+        messages = self._pending.get(patient_id)
+        if messages is not None:
+            message = messages.pop(values["id"], None)
+            if not messages:
+                del self._pending[patient_id]
+        if error is None:
+            self.saved += 1
+        else:
+            self.failed += 1
+            self._failed.setdefault(patient_id, {})[values["id"]] = message or ChatMessage(**values)
+
+    async def _retry(self, patient_id: str, values: dict, attempt: int):
+        await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        try:
+            await self._enqueue(patient_id, values, attempt + 1)
+        except Exception:
+            pass  # écrivain arrêté entre-temps : échec déjà enregistré par _written
+
+    def failed_messages(self, patient_id: str) -> List[ChatMessage]:
+        """Messages du patient définitivement non enregistrés, du plus ancien au plus récent"""
+        return sorted(self._failed.get(patient_id, {}).values(), key=lambda m: (m.created_at, m.id))
+
+    def forget(self, patient_id: str):
+        """Historique effacé : les échecs signalés pour ce patient n'ont plus d'objet"""
+        self._failed.pop(patient_id, None)
+
+    async def stop(self):
+        """Attend les nouveaux essais programmés (avant l'arrêt de l'écrivain)"""
+        while self._retry_tasks:
+            await asyncio.gather(*self._retry_tasks, return_exceptions=True)
+
+    def pending(self, patient_id: str) -> List[ChatMessage]:
+        """Messages du patient pas encore écrits, du plus ancien au plus récent"""
+        return sorted(self._pending.get(patient_id, {}).values(), key=lambda m: (m.created_at, m.id))
+
+    async def flush(self):
+        await self.writer.flush()
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": sum(len(messages) for messages in self._pending.values()),
+            "saved": self.saved,
+            "retried": self.retried,
+            "failed": self.failed,
+            "id_blocks_reserved": self.allocator.blocks,
+            "id_block_size": self.allocator.block_size,
+        }
+
+chat_store = ChatMessageStore(
+    db_writer,
+    IdAllocator(AsyncSessionLocal, "chat_messages", ChatMessage.id, settings.chat_id_block_size),
+    settings.chat_write_retries, settings.chat_write_retry_delay
+)
@@ -0,0 +1,187 @@
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import Dict, List, Optional
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière : environ 4 caractères par token"""
+    return len(text) // 4 + 1
+
+def parse_filter_date(value) -> Optional[date]:
+    """Accepte 'YYYY-MM-DD' ou un horodatage ISO complet (toISOString côté frontend)"""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def filter_reports_by_date(reports, date_filter: dict = None) -> list:
+    """Rapports compris dans la période du filtre (tous si pas de filtre complet)"""
+    if not (date_filter and date_filter.get('startDate') and date_filter.get('endDate')):
+        return list(reports)
+    start_date = parse_filter_date(date_filter['startDate'])
+    end_date = parse_filter_date(date_filter['endDate'])
+    return [report for report in reports if start_date <= parse_filter_date(report.date) <= end_date]
+
+class PatientContext:
+    """
+    Contexte patient prêt à insérer dans le prompt, avec sa taille
+    """
+    def __init__(self, text: str, token_budget: int, reports_total: int,
+                 reports_full: int, reports_summary: int, reports_omitted: int,
+                 reports_excerpt: int = 0, reports_abstract: int = 0):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.token_budget = token_budget
+        self.reports_total = reports_total
+        self.reports_full = reports_full
+        self.reports_summary = reports_summary
+        self.reports_omitted = reports_omitted
+        self.reports_excerpt = reports_excerpt
+        self.reports_abstract = reports_abstract
+
+    def as_metadata(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "characters": len(self.text),
+            "token_budget": self.token_budget,
+            "reports_total": self.reports_total,
+            "reports_full": self.reports_full,
+            "reports_summary": self.reports_summary,
+            "reports_omitted": self.reports_omitted,
+            "reports_excerpt": self.reports_excerpt,
+            "reports_abstract": self.reports_abstract,
+        }
+
+class PatientContextBuilder:
+    """
+    Construit le contexte textuel du patient pour Gemini dans un budget de tokens.
+
+    Le bloc rendu de chaque rapport (texte complet et version résumée) est mis en cache
+    par id de rapport ; l'empreinte du contenu détecte un rapport modifié. Un rapport dont
+    le résumé structuré (report.abstract) est à jour est envoyé sous cette forme condensée.
+    """
+    def __init__(self, token_budget: int, max_cached_reports: int = 5000):
+        self.token_budget = token_budget
+        self.max_cached_reports = max_cached_reports
+        self._blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, patient, date_filter: dict = None,
+              excerpts: Dict[str, List[str]] = None) -> PatientContext:
+        """
+        excerpts : morceaux de texte pertinents par id de rapport (index de recherche) ;
+        s'il est fourni, ils remplacent le texte complet des rapports
+        """
+        header = f"""
+        Patient: {patient.first_name} {patient.last_name}
+        Geburtsdatum: {patient.birth_date.strftime('%d.%m.%Y')}
+        Hauptdiagnose: {patient.primary_condition or 'Nicht angegeben'}
+        Aktueller Status: {patient.current_status or 'Nicht angegeben'}
+
+        Komorbiditäten:
+        """
+        if patient.comorbidities:
+            for comorbidity in patient.comorbidities:
+                header += f"- {comorbidity.name}\n"
+        else:
+            header += "Keine Komorbiditäten dokumentiert\n"
+
+        header += "\nMedizinische Berichte:\n"
+        if not patient.reports:
+            header += "Keine medizinischen Berichte verfügbar\n"
+            return PatientContext(header, self.token_budget, 0, 0, 0, 0)
+
+        reports = filter_reports_by_date(patient.reports, date_filter)
+        if date_filter and date_filter.get('startDate') and date_filter.get('endDate'):
+            start_date = parse_filter_date(date_filter['startDate'])
+            end_date = parse_filter_date(date_filter['endDate'])
+            header += f"(Zeitraum: {start_date.isoformat()} bis {end_date.isoformat()})\n"
+
+        # Les rapports les plus récents passent en premier dans le budget
+        reports.sort(key=lambda report: parse_filter_date(report.date), reverse=True)
+
+        remaining = self.token_budget - estimate_tokens(header)
+        blocks = []
+        counts = Counter()
+        for report in reports:
+            full_block, full_tokens, summary_block, summary_tokens, abstract_block, abstract_tokens = self._render(report)
+            summary = (summary_block, summary_tokens, 'summary')
+            abstract = (abstract_block, abstract_tokens, 'abstract') if abstract_block else None
+            if excerpts and report.id in excerpts:
+                # Mode recherche : seulement les extraits pertinents du texte
+                excerpt_block = self._render_excerpts(summary_block, excerpts[report.id])
+                preferred = (excerpt_block, estimate_tokens(excerpt_block), 'excerpt')
+            elif abstract:
+                preferred = abstract
+            elif not excerpts:
+                preferred = (full_block, full_tokens, 'full')
+            else:
+                preferred = summary
+            for block, tokens, kind in (preferred, summary):
+                if tokens <= remaining:
+                    blocks.append(block)
+                    remaining -= tokens
+                    counts[kind] += 1
+                    break
+
+        omitted = len(reports) - sum(counts.values())
+        text = header + "".join(blocks)
+        if omitted:
+            text += f"\n({omitted} ältere Berichte aus Platzgründen nicht enthalten)\n"
+        return PatientContext(text, self.token_budget, len(reports), counts['full'], counts['summary'],
+                              omitted, counts['excerpt'], counts['abstract'])
+
+    @staticmethod
+    def _render_excerpts(summary_block: str, chunks: List[str]) -> str:
+        lines = "\n".join(f"- {chunk}" for chunk in chunks)
+        return summary_block.replace("Volltext: (aus Platzgründen gekürzt)\n", f"Relevante Auszüge:\n{lines}\n")
+
+    def _render(self, report):
+        abstract = getattr(report, "abstract", None)
+        if abstract is not None and not abstract.is_fresh:
+            abstract = None
+        fingerprint = hash((report.type, report.title, str(report.date), report.doctor, report.summary, report.full_text,
+                            (abstract.version, abstract.updated_at) if abstract else None))
+        cached = self._blocks.get(report.id)
+        if cached is not None and cached[0] == fingerprint:
+            self._blocks.move_to_end(report.id)
+            self.hits += 1
+            return cached[1:]
+
+        self.misses += 1
+        head = f"""
+[{report.type}] {report.title}
+Datum: {report.date}
+Arzt: {report.doctor}
+Zusammenfassung: {report.summary or 'Keine Zusammenfassung'}
+"""
+        full_block = head + f"Volltext: {report.full_text or 'Kein Volltext verfügbar'}\n---\n"
+        summary_block = head + "Volltext: (aus Platzgründen gekürzt)\n---\n"
+        abstract_block = None
+        if abstract:
+            abstract_block = f"""
+[{report.type}] {report.title}
+Datum: {report.date}
+Arzt: {report.doctor}
+Befund: {abstract.findings or 'Keine Angaben'}
+Diagnose: {abstract.diagnosis or 'Keine Angaben'}
+Empfehlung: {abstract.recommendation or 'Keine Angaben'}
+---
+"""
+        entry = (fingerprint, full_block, estimate_tokens(full_block), summary_block, estimate_tokens(summary_block),
+                 abstract_block, estimate_tokens(abstract_block) if abstract_block else 0)
+        self._blocks[report.id] = entry
+        while len(self._blocks) > self.max_cached_reports:
+            self._blocks.popitem(last=False)
+        return entry[1:]
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached_reports": len(self._blocks),
+            "token_budget": self.token_budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import deque
+
+async def _noop(db):
+    return None
+
+class DatabaseWriter:
+    """
+    Écrivain unique : les écritures soumises sont exécutées par une seule tâche,
+    regroupées en une transaction (un seul commit) par lot.
+
+    Une opération est une coroutine `operation(session)` qui ajoute ses objets,
+    et dont la valeur de retour est transmise à l'appelant après le commit (submit),
+    ou qui est seulement mise en file sans attendre l'écriture (enqueue).
+    Tant que l'écrivain n'est pas démarré, chaque écriture est exécutée directement
+    dans sa propre session.
+    """
+    def __init__(self, session_factory, max_batch: int = 100, max_delay: float = 0.002,
+                 window: int = 1000):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_batch_seen = 0
+        self._commit_times = deque(maxlen=window)
+        self._write_times = deque(maxlen=window)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Traite les écritures déjà soumises, puis arrête la tâche"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, operation):
+        submitted_at = time.perf_counter()
+        if not self.running:
+            (result,) = await self._write([operation])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((operation, future, None))
+            result = await future
+        self._write_times.append(time.perf_counter() - submitted_at)
+        return result
+
+    async def enqueue(self, operation, done=None):
+        """
+        Écriture différée : rend la main dès la mise en file. done(error) est appelé
+        après le commit (error vaut None) ou après l'échec définitif de l'écriture.
+        """
+        if self.running:
+            await self._queue.put((operation, None, done))
+            return
+        try:
+            await self._write([operation])
+        except Exception as e:
+            if done is not None:
+                done(e)
+            raise
+        if done is not None:
+            done(None)
+
+    async def flush(self):
+        """Attend que toutes les écritures mises en file avant l'appel soient enregistrées"""
+        if self.running:
+            await self.submit(_noop)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Laisse aux requêtes concurrentes le temps de rejoindre le lot
+            if self.max_delay > 0:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch):
+        try:
+            results = await self._write([operation for operation, _, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Lot en échec : chaque écriture est rejouée seule pour isoler l'erreur
+                for item in batch:
+                    await self._write_batch([item])
+                return
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            _, future, done = batch[0]
+            if future is not None and not future.done():
+                future.set_exception(e)
+            if done is not None:
+                done(e)
+            return
+        for (_, future, done), result in zip(batch, results):
+            if future is not None and not future.done():
+                future.set_result(result)
+            if done is not None:
+                done(None)
+
+    async def _write(self, operations) -> list:
+        async with self.session_factory() as db:
+            results = [await operation(db) for operation in operations]
+            started_at = time.perf_counter()
+            await db.commit()
+            self._commit_times.append(time.perf_counter() - started_at)
+        self.batches += 1
+        self.writes += len(operations)
+        self.max_batch_seen = max(self.max_batch_seen, len(operations))
+        return results
+
+    def snapshot(self) -> dict:
+        commit_times = sorted(self._commit_times)
+        write_times = sorted(self._write_times)
+
+        def percentile(values, q):
+            return round(1000 * values[min(len(values) - 1, int(q * (len(values) - 1)))], 2) if values else 0.0
+
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "writes": self.writes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "mean_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "commit_ms": {"p50": percentile(commit_times, 0.50), "p99": percentile(commit_times, 0.99)},
+            "write_ms": {"p50": percentile(write_times, 0.50), "p99": percentile(write_times, 0.99)},
+        }
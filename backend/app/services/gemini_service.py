@@ -1,27 +1,317 @@
+import asyncio
+import time
+from collections import deque
 import google.generativeai as genai
+from sqlalchemy import func, select
 from ..config import settings
 from typing import List
-from ..models.database import Patient, Report
+from ..metrics import GEMINI_QUEUE_WAIT, GEMINI_REQUEST_DURATION, GEMINI_REQUESTS, GEMINI_TOKENS
+from ..models.database import ChatMessage, DepartmentCount, Patient, Report
+from .answer_cache import AnswerCache, make_answer_key
+from .context_builder import PatientContext, PatientContextBuilder, estimate_tokens, filter_reports_by_date
+from .intent_router import Intent, IntentRouter, PATIENT_COUNT, PATIENT_LIST
+from .patient_stats import filter_patients, patient_statistics
+from .report_abstracts import parse_abstract
+from .chat_memory import ConversationHistory, SENDER_LABELS
+from .retrieval import RetrievalIndex
+from .single_flight import SingleFlight
+
+# Question fictive : clé de cache des analyses d'ensemble (revue de cohorte)
+COHORT_ANALYSIS_QUESTION = "__cohort_analysis__"
+
+class GeminiBusyError(Exception):
+    """Aucune place libre dans le pool d'appels Gemini dans le délai d'attente"""
+
+class GeminiTimeoutError(Exception):
+    """L'appel Gemini a dépassé le délai maximal"""
+
+def _record_tokens(response, prompt: str, text: str):
+    """Tokens de l'appel d'après usage_metadata, estimés si la réponse n'en fournit pas"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text)
+    GEMINI_TOKENS.inc("prompt", amount=prompt_tokens)
+    GEMINI_TOKENS.inc("output", amount=output_tokens)
+
+class CallStats:
+    """
+    Statistiques de latence des appels Gemini sur une fenêtre glissante
+    """
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._latencies = deque(maxlen=window)
+        self._waits = deque(maxlen=window)
+        self._finished_at = deque(maxlen=window)
+
+    def record(self, latency: float, wait: float):
+        self.calls += 1
+        self._latencies.append(latency)
+        self._waits.append(wait)
+        self._finished_at.append(time.monotonic())
+
+    @staticmethod
+    def _percentile(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        latencies = list(self._latencies)
+        waits = list(self._waits)
+        # Débit observé sur la fenêtre : appels terminés par seconde
+        throughput = 0.0
+        if len(self._finished_at) > 1:
+            span = self._finished_at[-1] - self._finished_at[0]
+            if span > 0:
+                throughput = (len(self._finished_at) - 1) / span
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_concurrency": settings.gemini_max_concurrency,
+            "latency_ms": {
+                "mean": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p50": round(1000 * self._percentile(latencies, 0.50), 1),
+                "p95": round(1000 * self._percentile(latencies, 0.95), 1),
+                "p99": round(1000 * self._percentile(latencies, 0.99), 1),
+            },
+            "queue_wait_ms": {
+                "p50": round(1000 * self._percentile(waits, 0.50), 1),
+                "p95": round(1000 * self._percentile(waits, 0.95), 1),
+            },
+            "throughput_per_s": round(throughput, 2),
+        }
 
 class GeminiService:
     def __init__(self):
         genai.configure(api_key=settings.gemini_api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Limite le nombre d'appels Gemini simultanés pour tout le processus
+        self._semaphore = asyncio.Semaphore(settings.gemini_max_concurrency)
+        self.stats = CallStats()
+        self.answer_cache = AnswerCache(settings.answer_cache_max_entries, settings.answer_cache_ttl)
+        self.context_builder = PatientContextBuilder(settings.context_token_budget)
+        self.retrieval_index = RetrievalIndex(chunk_words=settings.retrieval_chunk_words)
+        self.intent_router = IntentRouter()
+        self.single_flight = SingleFlight()
+
+    async def _acquire_slot(self, mode: str):
+        """
+        Attend une place libre dans le pool d'appels, au plus gemini_queue_timeout secondes
+        """
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=settings.gemini_queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats.rejected += 1
+            GEMINI_REQUESTS.inc(mode, "rejected")
+            raise GeminiBusyError("Trop d'appels Gemini en cours, veuillez réessayer")
+
+    async def _generate(self, prompt: str) -> str:
+        """
+        Appel asynchrone à Gemini, borné par le pool et soumis aux délais configurés
+        """
+        queued_at = time.perf_counter()
+        await self._acquire_slot("generate")
+        started_at = time.perf_counter()
+        GEMINI_QUEUE_WAIT.observe(started_at - queued_at)
+        self.stats.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+        outcome = "cancelled"
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt),
+                timeout=settings.gemini_timeout
+            )
+            text = response.text
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            outcome = "timeout"
+            raise GeminiTimeoutError(f"Keine Antwort von Gemini nach {settings.gemini_timeout:g} s")
+        except Exception:
+            self.stats.errors += 1
+            outcome = "error"
+            raise
+        finally:
+            self.stats.in_flight -= 1
+            self._semaphore.release()
+            GEMINI_REQUESTS.inc("generate", outcome)
+            GEMINI_REQUEST_DURATION.observe(time.perf_counter() - started_at, "generate", outcome)
+
+        self.stats.record(time.perf_counter() - started_at, started_at - queued_at)
+        _record_tokens(response, prompt, text)
+        return text
+
+    async def _generate_stream(self, prompt: str):
+        """
+        Génération en streaming : renvoie le texte au fur et à mesure, sous les mêmes limites que _generate
+        """
+        queued_at = time.perf_counter()
+        await self._acquire_slot("stream")
+        started_at = time.perf_counter()
+        GEMINI_QUEUE_WAIT.observe(started_at - queued_at)
+        deadline = started_at + settings.gemini_timeout
+        self.stats.in_flight += 1
+        self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+        # 'cancelled' : flux abandonné par le client ou tâche annulée avant la fin
+        outcome = "cancelled"
+        streamed = []
+        try:
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True),
+                timeout=settings.gemini_timeout
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(),
+                        timeout=max(deadline - time.perf_counter(), 0)
+                    )
+                except StopAsyncIteration:
+                    break
+                if chunk.text:
+                    streamed.append(chunk.text)
+                    yield chunk.text
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            outcome = "timeout"
+            raise GeminiTimeoutError(f"Keine Antwort von Gemini nach {settings.gemini_timeout:g} s")
+        except Exception:
+            self.stats.errors += 1
+            outcome = "error"
+            raise
+        finally:
+            self.stats.in_flight -= 1
+            self._semaphore.release()
+            GEMINI_REQUESTS.inc("stream", outcome)
+            GEMINI_REQUEST_DURATION.observe(time.perf_counter() - started_at, "stream", outcome)
+
+        self.stats.record(time.perf_counter() - started_at, started_at - queued_at)
+        _record_tokens(response, prompt, "".join(streamed))
     
-    async def get_patient_analysis(self, patient: Patient, user_question: str, date_filter: dict = None) -> str:
+    def build_patient_context(self, patient: Patient, date_filter: dict = None,
+                              user_question: str = None) -> PatientContext:
+        """
+        Contexte du patient limité au budget de tokens configuré. Pour un dossier
+        volumineux, seuls les extraits de rapports pertinents pour la question sont envoyés.
+        """
+        excerpts = None
+        if user_question and settings.retrieval_top_k > 0:
+            reports = filter_reports_by_date(patient.reports, date_filter)
+            full_text_tokens = sum(estimate_tokens(report.full_text or '') for report in reports)
+            if full_text_tokens > settings.retrieval_min_context_tokens:
+                excerpts = self.retrieval_index.relevant_chunks(
+                    patient.id, patient.reports, user_question, settings.retrieval_top_k,
+                    report_ids={report.id for report in reports}
+                )
+        return self.context_builder.build(patient, date_filter, excerpts)
+
+    async def get_patient_analysis(self, patient: Patient, user_question: str, date_filter: dict = None,
+                                   use_cache: bool = True, context: PatientContext = None,
+                                   history: ConversationHistory = None) -> str:
         """
         Analyse les données du patient avec Gemini AI
         """
+        try:
+            return await self.answer_patient_question(patient, user_question, date_filter, use_cache, context, history)
+        except GeminiBusyError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Analyse: {str(e)}"
+
+    async def answer_patient_question(self, patient: Patient, user_question: str, date_filter: dict = None,
+                                      use_cache: bool = True, context: PatientContext = None,
+                                      history: ConversationHistory = None) -> str:
+        """
+        Variante de get_patient_analysis qui lève les erreurs (jobs d'analyse, réessayés)
+        """
+        cache_key = self._answer_key(patient, user_question, date_filter, history) if use_cache else None
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        prompt = self._build_analysis_prompt(patient, user_question, date_filter, context, history)
+
+        async def generate() -> str:
+            answer = await self._generate(prompt)
+            if cache_key:
+                self.answer_cache.set(cache_key, answer)
+            return answer
+        
+        if cache_key:
+            # Même patient, même question, même période déjà en cours : un seul appel Gemini
+            return await self.single_flight.do(cache_key, generate)
+        return await generate()
+
+    async def stream_patient_analysis(self, patient: Patient, user_question: str, date_filter: dict = None,
+                                      use_cache: bool = True, context: PatientContext = None,
+                                      history: ConversationHistory = None):
+        """
+        Variante de get_patient_analysis qui renvoie la réponse par fragments
+        """
+        cache_key = self._answer_key(patient, user_question, date_filter, history) if use_cache else None
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        prompt = self._build_analysis_prompt(patient, user_question, date_filter, context, history)
+
+        async def generate():
+            parts = []
+            async for chunk in self._generate_stream(prompt):
+                parts.append(chunk)
+                yield chunk
+            # Seule une réponse complète est mise en cache
+            if cache_key:
+                self.answer_cache.set(cache_key, "".join(parts))
+
+        chunks = self.single_flight.stream(cache_key, generate) if cache_key else generate()
+        async for chunk in chunks:
+            yield chunk
+
+    @staticmethod
+    def _answer_key(patient: Patient, user_question: str, date_filter: dict = None,
+                    history: ConversationHistory = None) -> str:
+        return make_answer_key(patient, user_question, date_filter, history.digest if history else "")
+
+    def _build_analysis_prompt(self, patient: Patient, user_question: str, date_filter: dict = None,
+                               context: PatientContext = None, history: ConversationHistory = None) -> str:
+        """
+        Construit le prompt d'analyse d'un patient
+        """
         # Construire le contexte du patient avec filtre temporel
-        context = self._build_patient_context(patient, date_filter)
+        if context is None:
+            context = self.build_patient_context(patient, date_filter, user_question)
+        conversation = ""
+        if history is not None and history.text:
+            # Résumé et derniers échanges : les questions de suivi gardent leur contexte
+            conversation = f"""
+        BISHERIGER GESPRÄCHSVERLAUF:
+        {history.text}
+"""
         
         # Créer le prompt pour Gemini
-        prompt = f"""
+        return f"""
         Du bist ein medizinischer Assistent. Analysiere die Patientendaten und beantworte die Frage direkt.
 
         PATIENTENDATEN:
-        {context}
-
+        {context.text}
+        {conversation}
         FRAGE: {user_question}
 
         ANTWORT-REGELN:
@@ -37,87 +327,101 @@ class GeminiService:
         2. **Diagnose:** Medizinische Bewertung  
         3. **Empfehlung:** Weitere Schritte
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Fehler bei der Analyse: {str(e)}"
     
     async def get_general_query(self, user_question: str, db_session) -> str:
         """
         Traite les requêtes générales sans patient spécifique
         """
-        # Analyser la question pour déterminer le type de requête
-        if any(keyword in user_question.lower() for keyword in ['liste', 'patients', 'heute', 'chirurgie', 'onkologie', 'kardiologie']):
-            return await self._handle_patient_list_query(user_question, db_session)
-        elif any(keyword in user_question.lower() for keyword in ['statistik', 'anzahl', 'zusammenfassung']):
-            return await self._handle_statistics_query(user_question, db_session)
-        else:
-            return await self._handle_general_medical_query(user_question)
+        intent = self.intent_router.route(user_question)
+        if intent.answered_by_sql:
+            return await self._answer_from_database(intent, db_session)
+        return await self._handle_general_medical_query(user_question)
+
+    async def stream_general_query(self, user_question: str, db_session):
+        """
+        Variante de get_general_query qui renvoie la réponse par fragments
+        """
+        intent = self.intent_router.route(user_question)
+        if intent.answered_by_sql:
+            # Les réponses issues de la base sont immédiates : un seul fragment
+            yield await self._answer_from_database(intent, db_session)
+            return
+        async for chunk in self._generate_stream(self._build_general_prompt(user_question)):
+            yield chunk
+
+    async def _answer_from_database(self, intent: Intent, db_session) -> str:
+        if intent.kind == PATIENT_LIST:
+            return await self._handle_patient_list_query(intent, db_session)
+        if intent.kind == PATIENT_COUNT:
+            return await self._handle_patient_count_query(intent, db_session)
+        return await self._handle_statistics_query(intent, db_session)
 
-    async def _handle_patient_list_query(self, question: str, db_session) -> str:
+    @staticmethod
+    def _filters_label(intent: Intent) -> str:
+        parts = [part for part in (intent.department, intent.period_label()) if part]
+        return f" – {', '.join(parts)}" if parts else ""
+
+    async def _handle_patient_list_query(self, intent: Intent, db_session) -> str:
         """
         Gère les requêtes de liste de patients
         """
-        from ..models.database import Patient
-        
-        # Déterminer le département demandé
-        department = None
-        if 'chirurgie' in question.lower():
-            department = 'Chirurgie'
-        elif 'onkologie' in question.lower():
-            department = 'Onkologie'
-        elif 'kardiologie' in question.lower():
-            department = 'Kardiologie'
-        elif 'orthopädie' in question.lower():
-            department = 'Orthopädie'
-        
-        # Requête pour récupérer les patients
-        if department:
-            patients = db_session.query(Patient).filter(
-                Patient.primary_condition.contains(department)
-            ).limit(10).all()
-        else:
-            patients = db_session.query(Patient).limit(10).all()
+        query = filter_patients(select(Patient), intent.department, intent.start_date, intent.end_date)
+        query = query.order_by(Patient.id).limit(intent.limit)
+        patients = (await db_session.scalars(query)).all()
         
         if not patients:
+            if intent.department or intent.start_date:
+                return f"**Keine Patienten gefunden**{self._filters_label(intent)}"
             return "**Keine Patienten gefunden**\n\n*Aktuell sind keine Patienten in der Datenbank registriert.*"
         
         # Formater la réponse
-        response = f"**Patientenliste** *({len(patients)} Patienten)*\n\n"
+        response = f"**Patientenliste**{self._filters_label(intent)} *({len(patients)} Patienten)*\n\n"
         
         for i, patient in enumerate(patients, 1):
             response += f"**{i}. {patient.first_name} {patient.last_name}**\n"
             response += f"• *ID:* {patient.id}\n"
             response += f"• *Diagnose:* {patient.primary_condition}\n"
             response += f"• *Status:* {patient.current_status}\n"
-            response += f"• *Geboren:* {patient.birth_date}\n\n"
+            response += f"• *Geboren:* {patient.birth_date.strftime('%d.%m.%Y')}\n\n"
         
         return response
 
-    async def _handle_statistics_query(self, question: str, db_session) -> str:
+    async def _handle_patient_count_query(self, intent: Intent, db_session) -> str:
+        """
+        Nombre de patients : compteurs maintenus par la base sans période, COUNT sinon
+        """
+        if intent.start_date:
+            query = filter_patients(select(func.count(Patient.id)), intent.department,
+                                    intent.start_date, intent.end_date)
+            count = await db_session.scalar(query)
+        elif intent.department:
+            count = await db_session.scalar(
+                select(DepartmentCount.count).where(DepartmentCount.department == intent.department)
+            ) or 0
+        else:
+            count = await db_session.scalar(select(func.sum(DepartmentCount.count))) or 0
+        return f"**Anzahl Patienten**{self._filters_label(intent)}: {count}"
+
+    async def _handle_statistics_query(self, intent: Intent, db_session) -> str:
         """
         Gère les requêtes statistiques
         """
-        from ..models.database import Patient
-        from sqlalchemy import func
-        
-        total_patients = db_session.query(Patient).count()
-        
-        # Statistiques par département
-        dept_stats = db_session.query(
-            Patient.primary_condition,
-            func.count(Patient.id).label('count')
-        ).group_by(Patient.primary_condition).all()
+        # Compteurs maintenus par la base : coût indépendant du nombre de patients
+        stats = await patient_statistics(db_session)
         
         response = f"**Patientenstatistiken**\n\n"
-        response += f"• **Gesamt:** {total_patients} Patienten\n\n"
+        response += f"• **Gesamt:** {stats['total']} Patienten\n\n"
         
-        if dept_stats:
+        if stats["departments"]:
             response += "**Verteilung nach Fachbereich:**\n"
-            for condition, count in dept_stats:
-                response += f"• *{condition}:* {count} Patienten\n"
+            for department, count in stats["departments"]:
+                response += f"• *{department or 'Ohne Fachbereich'}:* {count} Patienten\n"
+            response += "\n"
+        
+        if stats["conditions"]:
+            response += "**Häufigste Diagnosen:**\n"
+            for condition, count in stats["conditions"]:
+                response += f"• *{condition or 'Ohne Diagnose'}:* {count} Patienten\n"
         
         return response
 
@@ -125,7 +429,17 @@ class GeminiService:
         """
         Gère les questions médicales générales
         """
-        prompt = f"""
+        prompt = self._build_general_prompt(question)
+        
+        try:
+            return await self._generate(prompt)
+        except GeminiBusyError:
+            raise
+        except Exception as e:
+            return f"**Fehler bei der Verarbeitung**\n\n*{str(e)}*"
+
+    def _build_general_prompt(self, question: str) -> str:
+        return f"""
         Du bist ein medizinischer Assistent. Beantworte die folgende allgemeine medizinische Frage präzise und professionell.
 
         FRAGE: {question}
@@ -136,44 +450,6 @@ class GeminiService:
         - Verwende Stichpunkte für strukturierte Informationen
         - Medizinische Fachbegriffe korrekt verwenden
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"**Fehler bei der Verarbeitung**\n\n*{str(e)}*"
-        """
-        Construit le contexte textuel du patient pour Gemini
-        """
-        context = f"""
-        Nom: {patient.first_name} {patient.last_name}
-        Date de naissance: {patient.birth_date}
-        Condition principale: {patient.primary_condition or 'Non spécifiée'}
-        Statut actuel: {patient.current_status or 'Non spécifié'}
-        
-        Comorbidités:
-        """
-        if patient.comorbidities:
-            for comorbidity in patient.comorbidities:
-                context += f"- {comorbidity.name}\n"
-        else:
-            context += "Aucune comorbidité enregistrée\n"
-        
-        context += "\nRapports médicaux:\n"
-        if patient.reports:
-            for report in patient.reports:
-                context += f"""
-                [{report.type}] {report.title}
-                Date: {report.date}
-                Médecin: {report.doctor}
-                Résumé: {report.summary or 'Pas de résumé'}
-                Texte complet: {report.full_text or 'Pas de texte complet'}
-                ---
-                """
-        else:
-            context += "Aucun rapport médical disponible\n"
-        
-        return context
     
     async def analyze_reports(self, reports: List[Report]) -> str:
         """
@@ -182,6 +458,90 @@ class GeminiService:
         if not reports:
             return "Aucun rapport à analyser."
         
+        try:
+            return await self._generate(self._build_reports_prompt(reports))
+        except GeminiBusyError:
+            raise
+        except Exception as e:
+            return f"Fehler bei der Analyse der Berichte: {str(e)}"
+
+    async def analyze_patient_reports(self, patient: Patient, date_filter: dict = None,
+                                      use_cache: bool = True) -> str:
+        """
+        Analyse d'ensemble des rapports déjà chargés d'un patient (revue de cohorte) :
+        mise en cache et appels identiques regroupés comme les réponses du chat.
+        Les erreurs sont levées, pour être rapportées patient par patient.
+        """
+        if not patient.reports:
+            return "Keine Berichte im gewählten Zeitraum."
+
+        cache_key = make_answer_key(patient, COHORT_ANALYSIS_QUESTION, date_filter) if use_cache else None
+        if cache_key:
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Même contexte que le chat : budget de tokens, résumés structurés à jour
+        prompt = self._build_overview_prompt(self.build_patient_context(patient, date_filter).text)
+
+        async def generate() -> str:
+            answer = await self._generate(prompt)
+            if cache_key:
+                self.answer_cache.set(cache_key, answer)
+            return answer
+
+        if cache_key:
+            return await self.single_flight.do(cache_key, generate)
+        return await generate()
+
+    async def condense_report(self, report: Report) -> dict:
+        """
+        Résumé structuré d'un rapport (Befund, Diagnose, Empfehlung) pour report_abstracts :
+        produit une fois hors des requêtes du chat, puis utilisé dans les contextes
+        """
+        return parse_abstract(await self._generate(self._build_condense_prompt(report)))
+
+    async def summarize_conversation(self, summary: str, messages: List[ChatMessage]) -> str:
+        """
+        Nouveau résumé du fil : l'ancien résumé complété par les échanges sortis de la
+        fenêtre des derniers messages (mémoire du chat)
+        """
+        exchanges = "\n".join(
+            f"{SENDER_LABELS.get(message.sender, message.sender)}: {message.message}" for message in messages
+        )
+        words = max(settings.chat_memory_summary_max_tokens * 3 // 4, 50)
+        prompt = f"""
+        Du führst das Gedächtnis eines ärztlichen Gesprächs über einen Patienten.
+        Ergänze die bisherige Zusammenfassung um die neuen Nachrichten.
+
+        BISHERIGE ZUSAMMENFASSUNG:
+        {summary or 'Keine'}
+
+        NEUE NACHRICHTEN:
+        {exchanges}
+
+        Regeln:
+        - Höchstens {words} Wörter, auf Deutsch, stichpunktartig
+        - Behalte gestellte Fragen, gegebene Antworten, Entscheidungen und offene Punkte
+        - Keine Informationen erfinden, keine Einleitung
+        """
+        return await self._generate(prompt)
+
+    def _build_condense_prompt(self, report: Report) -> str:
+        return f"""
+        Fasse den folgenden medizinischen Bericht für spätere Rückfragen knapp und vollständig zusammen.
+
+        Typ: {report.type}
+        Titel: {report.title}
+        Zusammenfassung: {report.summary or ''}
+        Text: {report.full_text or ''}
+
+        Antworte ausschließlich mit einem JSON-Objekt auf Deutsch, ohne weiteren Text:
+        {{"befund": "wesentliche Befunde mit Messwerten", "diagnose": "Diagnose bzw. Beurteilung", "empfehlung": "empfohlenes Vorgehen"}}
+        Fehlt eine Angabe im Bericht, verwende "Keine Angaben".
+        """
+
+    def _build_reports_prompt(self, reports: List[Report]) -> str:
         reports_text = ""
         for report in reports:
             reports_text += f"""
@@ -192,8 +552,10 @@ class GeminiService:
             Texte: {report.full_text or ''}
             ---
             """
-        
-        prompt = f"""
+        return self._build_overview_prompt(reports_text)
+
+    def _build_overview_prompt(self, reports_text: str) -> str:
+        return f"""
         Analysiere die folgenden medizinischen Berichte und erstelle eine strukturierte Gesamtanalyse:
 
         {reports_text}
@@ -210,55 +572,3 @@ class GeminiService:
         
         Verwende medizinische Fachbegriffe korrekt und fasse die wichtigsten Punkte prägnant zusammen.
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Fehler bei der Analyse der Berichte: {str(e)}"
-
-    def _build_patient_context(self, patient, date_filter: dict = None) -> str:
-        """
-        Construit le contexte textuel du patient pour Gemini
-        """
-        context = f"""
-        Patient: {patient.first_name} {patient.last_name}
-        Geburtsdatum: {patient.birth_date}
-        Hauptdiagnose: {patient.primary_condition or 'Nicht angegeben'}
-        Aktueller Status: {patient.current_status or 'Nicht angegeben'}
-        
-        Komorbiditäten:
-        """
-        if patient.comorbidities:
-            for comorbidity in patient.comorbidities:
-                context += f"- {comorbidity.name}\n"
-        else:
-            context += "Keine Komorbiditäten dokumentiert\n"
-        
-        context += "\nMedizinische Berichte:\n"
-        if patient.reports:
-            # Filtrer les rapports par date si un filtre est fourni
-            filtered_reports = patient.reports
-            if date_filter and date_filter.get('startDate') and date_filter.get('endDate'):
-                from datetime import datetime
-                start_date = datetime.fromisoformat(date_filter['startDate'])
-                end_date = datetime.fromisoformat(date_filter['endDate'])
-                filtered_reports = [
-                    report for report in patient.reports
-                    if start_date <= datetime.fromisoformat(report.date) <= end_date
-                ]
-                context += f"(Zeitraum: {date_filter['startDate']} bis {date_filter['endDate']})\n"
-            
-            for report in filtered_reports:
-                context += f"""
-[{report.type}] {report.title}
-Datum: {report.date}
-Arzt: {report.doctor}
-Zusammenfassung: {report.summary or 'Keine Zusammenfassung'}
-Volltext: {report.full_text or 'Kein Volltext verfügbar'}
----
-"""
-        else:
-            context += "Keine medizinischen Berichte verfügbar\n"
-        
-        return context
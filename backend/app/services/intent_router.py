@@ -0,0 +1,202 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+from ..schemas.schemas import DEPARTMENTS
+
+# Intentions des questions générales : les trois premières sont répondues en SQL,
+# seule 'general' est envoyée au LLM
+PATIENT_LIST = "patient_list"
+PATIENT_COUNT = "patient_count"
+STATISTICS = "statistics"
+GENERAL = "general"
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# "Statistik", "Zusammenfassung bitte" : sans autre précision, statistiques des patients
+STATISTICS_MAX_WORDS = 2
+
+# Racines reconnues pour chaque Fachbereich (adjectifs et graphies sans umlaut compris)
+DEPARTMENT_STEMS = {
+    "Chirurgie": ["chirurg"],
+    "Onkologie": ["onkolog"],
+    "Kardiologie": ["kardiolog"],
+    "Orthopädie": ["orthopäd", "orthopaed", "orthopad", "orthoped"],
+}
+
+# Le nom du Fachbereich lui-même ("Onkologie", "Orthopaedie") : seul, il suffit à
+# demander une liste, un adjectif ("onkologische Therapien") non
+DEPARTMENT_NOUNS = {f"{stem}ie" for stems in DEPARTMENT_STEMS.values() for stem in stems}
+
+_DATE = r"\d{1,2}\.\d{1,2}\.\d{4}|\d{4}-\d{2}-\d{2}"
+
+# Une seule expression, un seul parcours de la question : chaque groupe nommé est un
+# type de jeton, l'ordre des alternatives départage les jetons commençant au même endroit
+_TOKENS = [
+    ("statistics", r"statisti\w*|zusammenfassung\w*|verteilung\w*|übersicht\w*"),
+    ("count", r"anzahl\w*|wie\s*viele|zähl\w*|count"),
+    ("list", r"\w*liste\w*|auflist\w*|zeig\w*|nenne\w*"),
+    ("which", r"welche[rsn]?"),
+    ("patient", r"patient\w*"),
+    ("range", rf"(?:vom|von|zwischen)\s+(?P<range_from>{_DATE})\s+(?:bis|und)\s+(?P<range_to>{_DATE})"),
+    ("since", rf"seit\s+(?:dem\s+)?(?P<since_date>{_DATE})"),
+    ("last_n", r"(?:letzten|vergangenen)\s+(?P<last_n_value>\d+)\s+(?P<last_n_unit>tag|woche|monat)\w*"),
+    ("limit", r"(?:top|ersten|maximal|max\.?|höchstens)\s+(?P<limit_value>\d+)|(?P<limit_count>\d+)\s+(?=patient)"),
+    ("single_date", rf"(?:am\s+)?(?P<single_value>{_DATE})"),
+    ("today", r"heute\w*"),
+    ("yesterday", r"gestern\w*"),
+    ("this_week", r"(?:diese[rnm]?|aktuelle[rnm]?)\s+woche"),
+    ("last_week", r"(?:letzte[rnm]?|vergangene[rnm]?|vorige[rnm]?)\s+woche"),
+    ("this_month", r"(?:diese[rnm]?|aktuelle[rnm]?)\s+monat\w*"),
+    ("last_month", r"(?:letzte[rnm]?|vergangene[rnm]?|vorige[rnm]?)\s+monat\w*"),
+    ("this_year", r"(?:dieses|diesem|aktuelle[nms]?)\s+jahr\w*"),
+] + [
+    (f"department_{index}", "|".join(f"{stem}\\w*" for stem in DEPARTMENT_STEMS[name]))
+    for index, name in enumerate(DEPARTMENTS)
+]
+
+# Appliquée à la question en minuscules (plus rapide que re.IGNORECASE)
+TOKEN_PATTERN = re.compile(
+    r"\b(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in _TOKENS) + ")"
+)
+
+def _parse_date(value: str) -> Optional[date]:
+    try:
+        if "." in value:
+            return datetime.strptime(value, "%d.%m.%Y").date()
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+class Intent:
+    """Intention extraite d'une question : type, Fachbereich, période et nombre de résultats"""
+    def __init__(self, kind: str, department: str = None, start_date: date = None,
+                 end_date: date = None, limit: int = DEFAULT_LIMIT):
+        self.kind = kind
+        self.department = department
+        self.start_date = start_date
+        self.end_date = end_date
+        self.limit = limit
+
+    @property
+    def answered_by_sql(self) -> bool:
+        return self.kind != GENERAL
+
+    def period_label(self) -> Optional[str]:
+        if self.start_date is None:
+            return None
+        if self.start_date == self.end_date:
+            return self.start_date.strftime("%d.%m.%Y")
+        return f"{self.start_date.strftime('%d.%m.%Y')} bis {self.end_date.strftime('%d.%m.%Y')}"
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "department": self.department,
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+            "limit": self.limit,
+        }
+
+class IntentRouter:
+    """
+    Classement des questions générales en un seul passage d'une expression compilée.
+    Les questions structurées (listes, comptages, statistiques de patients) sont
+    répondues depuis la base ; les autres partent au LLM. Compte la part des
+    questions qui n'atteignent jamais le LLM.
+    """
+    def __init__(self):
+        self.routed = {PATIENT_LIST: 0, PATIENT_COUNT: 0, STATISTICS: 0, GENERAL: 0}
+
+    def parse(self, question: str, today: date = None) -> Intent:
+        today = today or date.today()
+        seen = set()
+        department = None
+        department_noun = False
+        start_date = end_date = None
+        limit = None
+
+        for match in TOKEN_PATTERN.finditer(question.lower()):
+            token = match.lastgroup
+            seen.add(token)
+            if token == "list" and "patient" in match.group():
+                # "Patientenliste" : liste et patients en un seul mot
+                seen.add("patient")
+            if token.startswith("department_"):
+                department = department or DEPARTMENTS[int(token.rsplit("_", 1)[1])]
+                department_noun = department_noun or match.group() in DEPARTMENT_NOUNS
+            elif token == "limit":
+                limit = int(match.group("limit_value") or match.group("limit_count"))
+            elif start_date is None:
+                start_date, end_date = self._period(token, match, today)
+
+        # Il faut le nom d'un Fachbereich, ou "Patienten" accompagné d'une liste, d'une
+        # période ou d'une limite. Un adjectif ("kardiologische", "Chirurg") ne compte que
+        # s'il vient avec une demande explicite : "Wie behandelt man Patienten mit ...",
+        # "Welche onkologischen Therapien ..." ou "Was macht ein Chirurg ..." restent au LLM.
+        # Une statistique doit aussi porter sur les patients ou une période, sauf demande
+        # courte ("Statistik") : "Übersicht über die Therapieoptionen ..." part au LLM
+        explicit = "list" in seen or start_date is not None or limit is not None
+        if department is not None and not (department_noun or "patient" in seen or explicit):
+            department = None
+        about_patients = department is not None or "patient" in seen
+        if "statistics" in seen and (about_patients or start_date is not None
+                                     or len(question.split()) <= STATISTICS_MAX_WORDS):
+            kind = STATISTICS
+        elif "count" in seen and about_patients:
+            kind = PATIENT_COUNT
+        elif department is not None or ("patient" in seen and (explicit or "which" in seen)):
+            kind = PATIENT_LIST
+        else:
+            kind = GENERAL
+        return Intent(kind, department, start_date, end_date, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+    def _period(self, token: str, match, today: date):
+        if token == "today":
+            return today, today
+        if token == "yesterday":
+            day = today - timedelta(days=1)
+            return day, day
+        if token == "this_week":
+            return today - timedelta(days=today.weekday()), today
+        if token == "last_week":
+            start = today - timedelta(days=today.weekday() + 7)
+            return start, start + timedelta(days=6)
+        if token == "this_month":
+            return _month_start(today), today
+        if token == "last_month":
+            end = _month_start(today) - timedelta(days=1)
+            return _month_start(end), end
+        if token == "this_year":
+            return today.replace(month=1, day=1), today
+        if token == "last_n":
+            value = int(match.group("last_n_value"))
+            days = {"tag": 1, "woche": 7, "monat": 30}[match.group("last_n_unit")]
+            return today - timedelta(days=value * days), today
+        if token == "since":
+            start = _parse_date(match.group("since_date"))
+            return (start, today) if start else (None, None)
+        if token == "range":
+            start, end = _parse_date(match.group("range_from")), _parse_date(match.group("range_to"))
+            return (min(start, end), max(start, end)) if start and end else (None, None)
+        if token == "single_date":
+            day = _parse_date(match.group("single_value"))
+            return day, day
+        return None, None
+
+    def route(self, question: str) -> Intent:
+        intent = self.parse(question)
+        self.routed[intent.kind] += 1
+        return intent
+
+    def snapshot(self) -> dict:
+        total = sum(self.routed.values())
+        without_llm = total - self.routed[GENERAL]
+        return {
+            "routed": dict(self.routed),
+            "total": total,
+            "answered_without_llm": without_llm,
+            "without_llm_ratio": round(without_llm / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,229 @@
+import asyncio
+import itertools
+import uuid
+import weakref
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models.database import AnalysisJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+class PermanentJobError(Exception):
+    """Échec qu'un nouvel essai ne corrigerait pas (patient introuvable, paramètres invalides)"""
+
+class JobQueue:
+    """
+    Jobs d'analyse en arrière-plan : chaque job est enregistré dans analysis_jobs dès sa
+    soumission, puis exécuté par un pool de workers dans l'ordre des priorités (la plus
+    haute d'abord, puis la plus ancienne). Un échec est réessayé après un délai doublé à
+    chaque tentative, jusqu'à max_attempts. La table fait foi : au démarrage, les jobs en
+    attente ou interrompus en cours d'exécution sont remis dans la file.
+
+    Un gestionnaire est une coroutine `handler(job)` enregistrée par type de job (register)
+    et qui renvoie le résultat en texte. Prévu pour un seul processus : les jobs 'running'
+    trouvés au démarrage sont considérés comme interrompus.
+    """
+    def __init__(self, session_factory, workers: int = 2, max_attempts: int = 3,
+                 retry_backoff: float = 5.0, retry_backoff_max: float = 300.0):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.handlers = {}
+        self._queue = None
+        self._tasks = []
+        self._timers = {}
+        self._order = itertools.count()
+        # Libéré dès qu'aucun flux ne suit plus le job
+        self._changed = weakref.WeakValueDictionary()
+        self.submitted = 0
+        self.resumed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.errors = 0
+        self.last_error = None
+        self.in_progress = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def register(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        """Reprend les jobs non terminés, puis démarre les workers"""
+        if self.running:
+            return
+        self._queue = asyncio.PriorityQueue()
+        async with self.session_factory() as db:
+            # Jobs interrompus par un arrêt brutal : remis en attente
+            await db.execute(
+                update(AnalysisJob).where(AnalysisJob.status == RUNNING)
+                .values(status=QUEUED, updated_at=datetime.utcnow())
+            )
+            pending = (await db.execute(
+                select(AnalysisJob.id, AnalysisJob.priority, AnalysisJob.run_after)
+                .where(AnalysisJob.status == QUEUED)
+                .order_by(AnalysisJob.created_at)
+            )).all()
+            await db.commit()
+        for job_id, priority, run_after in pending:
+            self._schedule(job_id, priority, run_after)
+        self.resumed += len(pending)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Arrête les workers : les jobs en cours sont remis en attente (sans compter la
+        tentative) et seront repris au prochain démarrage
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, patient_id: str = None, params: dict = None,
+                     priority: int = 0, created_by: int = None) -> AnalysisJob:
+        """Enregistre le job et rend la main tout de suite ; il démarre dès qu'un worker est libre"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.utcnow()
+        job = AnalysisJob(
+            id=uuid.uuid4().hex, kind=kind, patient_id=patient_id, params=params or {},
+            status=QUEUED, priority=priority, attempts=0, max_attempts=self.max_attempts,
+            created_by=created_by, created_at=now, updated_at=now
+        )
+        async with self.session_factory() as db:
+            db.add(job)
+            await db.commit()
+        self.submitted += 1
+        if self.running:
+            self._schedule(job.id, priority)
+        return job
+
+    async def get(self, job_id: str):
+        async with self.session_factory() as db:
+            return await db.get(AnalysisJob, job_id)
+
+    def changed(self, job_id: str) -> asyncio.Event:
+        """Événement déclenché au prochain changement d'état du job (à relever avant de lire le job)"""
+        event = self._changed.get(job_id)
+        if event is None:
+            event = self._changed[job_id] = asyncio.Event()
+        return event
+
+    def _notify(self, job_id: str):
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _schedule(self, job_id: str, priority: int, run_after: datetime = None):
+        item = (-priority, next(self._order), job_id)
+        delay = (run_after - datetime.utcnow()).total_seconds() if run_after else 0
+        if delay <= 0:
+            self._queue.put_nowait(item)
+            return
+
+        def release():
+            self._timers.pop(job_id, None)
+            self._queue.put_nowait(item)
+        self._timers[job_id] = asyncio.get_running_loop().call_later(delay, release)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+
+    async def _work(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # Base indisponible : le job reste dans son état et sera repris au redémarrage
+                self.errors += 1
+                self.last_error = str(e)
+
+    async def _claim(self, job_id: str):
+        """Passe le job à 'running' s'il est toujours en attente (un seul worker l'obtient)"""
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            claimed = await db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.status == QUEUED)
+                .values(status=RUNNING, attempts=AnalysisJob.attempts + 1,
+                        started_at=now, updated_at=now, run_after=None)
+            )
+            job = await db.get(AnalysisJob, job_id) if claimed.rowcount == 1 else None
+            await db.commit()
+        return job
+
+    async def _update(self, job_id: str, **values):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(AnalysisJob).where(AnalysisJob.id == job_id)
+                .values(updated_at=datetime.utcnow(), **values)
+            )
+            await db.commit()
+        self._notify(job_id)
+
+    async def _run(self, job_id: str):
+        job = await self._claim(job_id)
+        if job is None:
+            return
+        self._notify(job_id)
+        self.in_progress += 1
+        try:
+            result = await self.handlers[job.kind](job)
+        except asyncio.CancelledError:
+            # Arrêt de l'application : le job sera repris au prochain démarrage
+            await asyncio.shield(self._update(job_id, status=QUEUED, attempts=job.attempts - 1, started_at=None))
+            raise
+        except Exception as e:
+            if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+                self.failed += 1
+                await self._update(job_id, status=FAILED, error=str(e), finished_at=datetime.utcnow())
+            else:
+                self.retries += 1
+                run_after = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+                await self._update(job_id, status=QUEUED, error=str(e), run_after=run_after)
+                self._schedule(job_id, job.priority, run_after)
+        else:
+            self.succeeded += 1
+            await self._update(job_id, status=SUCCEEDED, result=result, error=None,
+                               finished_at=datetime.utcnow())
+        finally:
+            self.in_progress -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "waiting_retry": len(self._timers),
+            "in_progress": self.in_progress,
+            "submitted": self.submitted,
+            "resumed": self.resumed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+# Jobs d'analyse : workers démarrés avec l'application
+job_queue = JobQueue(
+    AsyncSessionLocal, settings.job_workers, settings.job_max_attempts,
+    settings.job_retry_backoff, settings.job_retry_backoff_max
+)
@@ -0,0 +1,125 @@
+from sqlalchemy import select, text
+
+# Statistiques de la cohorte : les tables department_counts et condition_counts sont
+# tenues à jour par des triggers à chaque insertion, modification ou suppression de
+# patient, quel que soit le chemin d'écriture (ORM, insertion en masse, SQL direct).
+# Les lire ne dépend pas du nombre de patients.
+
+# (table, colonne de patients comptée)
+COUNTERS = [("department_counts", "department"), ("condition_counts", "primary_condition")]
+
+def _sqlite_ddl(table: str, column: str) -> list:
+    decrement = f"""
+        UPDATE {table} SET count = count - 1 WHERE {column} = coalesce(old.{column}, '');
+        DELETE FROM {table} WHERE {column} = coalesce(old.{column}, '') AND count <= 0;"""
+    increment = f"""
+        INSERT INTO {table} ({column}, count) VALUES (coalesce(new.{column}, ''), 1)
+        ON CONFLICT ({column}) DO UPDATE SET count = count + 1;"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON patients BEGIN{increment}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {column} ON patients "
+        f"WHEN coalesce(old.{column}, '') <> coalesce(new.{column}, '') BEGIN{decrement}{increment}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON patients BEGIN{decrement}\nEND",
+    ]
+
+def _postgres_ddl(table: str, column: str) -> list:
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND coalesce(OLD.{column}, '') = coalesce(NEW.{column}, '') THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE {table} SET count = count - 1 WHERE {column} = coalesce(OLD.{column}, '');
+                DELETE FROM {table} WHERE {column} = coalesce(OLD.{column}, '') AND count <= 0;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {table} ({column}, count) VALUES (coalesce(NEW.{column}, ''), 1)
+                ON CONFLICT ({column}) DO UPDATE SET count = {table}.count + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_apply ON patients",
+        f"CREATE TRIGGER {table}_apply AFTER INSERT OR DELETE OR UPDATE OF {column} ON patients "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_apply()",
+    ]
+
+def _backfill(table: str, column: str) -> list:
+    return [
+        f"DELETE FROM {table}",
+        f"INSERT INTO {table} ({column}, count) "
+        f"SELECT coalesce({column}, ''), count(*) FROM patients GROUP BY coalesce({column}, '')",
+    ]
+
+def _triggers_exist(connection, table: str) -> bool:
+    if connection.dialect.name == "sqlite":
+        query = f"SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = '{table}_insert'"
+    else:
+        query = f"SELECT 1 FROM pg_trigger WHERE tgname = '{table}_apply'"
+    return connection.execute(text(query)).first() is not None
+
+def create_patient_stats(connection):
+    """
+    Crée les triggers des compteurs s'ils n'existent pas encore (idempotent), et
+    recalcule les compteurs à partir des patients existants lors de leur création
+    """
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return
+    for table, column in COUNTERS:
+        exists = _triggers_exist(connection, table)
+        ddl = _sqlite_ddl(table, column) if dialect == "sqlite" else _postgres_ddl(table, column)
+        for statement in ddl:
+            connection.execute(text(statement))
+        if not exists:
+            for statement in _backfill(table, column):
+                connection.execute(text(statement))
+
+def drop_patient_stats(connection):
+    dialect = connection.dialect.name
+    for table, _ in COUNTERS:
+        if dialect == "sqlite":
+            for event in ("insert", "update", "delete"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_{event}"))
+        elif dialect == "postgresql":
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_apply ON patients"))
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {table}_apply()"))
+
+async def patient_statistics(db, top_conditions: int = 10) -> dict:
+    """Effectif total, répartition par Fachbereich et diagnostics les plus fréquents"""
+    from ..models.database import ConditionCount, DepartmentCount
+
+    departments = (await db.execute(
+        select(DepartmentCount.department, DepartmentCount.count)
+        .order_by(DepartmentCount.count.desc(), DepartmentCount.department)
+    )).all()
+    conditions = (await db.execute(
+        select(ConditionCount.primary_condition, ConditionCount.count)
+        .order_by(ConditionCount.count.desc())
+        .limit(top_conditions)
+    )).all()
+    return {
+        "total": sum(count for _, count in departments),
+        "departments": [(department or None, count) for department, count in departments],
+        "conditions": [(condition or None, count) for condition, count in conditions],
+    }
+
+def filter_patients(query, department: str = None, start_date=None, end_date=None):
+    """
+    Restreint une requête sur Patient à un Fachbereich (colonne indexée) et/ou aux
+    patients ayant un rapport dans la période (EXISTS sur l'index patient_id, date)
+    """
+    from ..models.database import Patient, Report
+
+    if department:
+        query = query.where(Patient.department == department)
+    if start_date:
+        query = query.where(select(Report.id).where(
+            Report.patient_id == Patient.id,
+            Report.date >= start_date,
+            Report.date <= end_date
+        ).exists())
+    return query
@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from datetime import datetime
+from sqlalchemy import or_, select, text
+from ..models.database import Report, ReportAbstract
+from .context_builder import estimate_tokens
+
+# Résumés structurés des rapports : produits une fois par rapport (hors des requêtes du
+# chat), puis utilisés dans le contexte des prompts à la place du texte complet.
+# Un trigger marque le résumé 'stale' dès que le titre, le résumé ou le texte du rapport change.
+
+# À incrémenter quand le prompt ou le format change : les résumés plus anciens sont refaits
+ABSTRACT_VERSION = 1
+FRESH = "fresh"
+STALE = "stale"
+
+SOURCE_COLUMNS = ("title", "summary", "full_text")
+
+SQLITE_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS report_abstracts_stale AFTER UPDATE OF title, summary, full_text ON reports
+    WHEN old.title IS NOT new.title OR old.summary IS NOT new.summary OR old.full_text IS NOT new.full_text
+    BEGIN
+        UPDATE report_abstracts SET status = 'stale' WHERE report_id = new.id;
+    END
+    """,
+    # Clés étrangères non appliquées par défaut avec SQLite
+    """
+    CREATE TRIGGER IF NOT EXISTS report_abstracts_delete AFTER DELETE ON reports BEGIN
+        DELETE FROM report_abstracts WHERE report_id = old.id;
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION report_abstracts_stale() RETURNS trigger AS $$
+    BEGIN
+        UPDATE report_abstracts SET status = 'stale' WHERE report_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS report_abstracts_stale ON reports",
+    """
+    CREATE TRIGGER report_abstracts_stale AFTER UPDATE OF title, summary, full_text ON reports
+    FOR EACH ROW WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.summary IS DISTINCT FROM NEW.summary
+                       OR OLD.full_text IS DISTINCT FROM NEW.full_text)
+    EXECUTE FUNCTION report_abstracts_stale()
+    """,
+]
+
+def create_abstract_triggers(connection):
+    """Crée les triggers de report_abstracts s'ils n'existent pas encore (idempotent)"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        ddl = SQLITE_DDL
+    elif dialect == "postgresql":
+        ddl = POSTGRES_DDL
+    else:
+        return
+    for statement in ddl:
+        connection.execute(text(statement))
+
+def drop_abstract_triggers(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.execute(text("DROP TRIGGER IF EXISTS report_abstracts_stale"))
+        connection.execute(text("DROP TRIGGER IF EXISTS report_abstracts_delete"))
+    elif dialect == "postgresql":
+        connection.execute(text("DROP TRIGGER IF EXISTS report_abstracts_stale ON reports"))
+        connection.execute(text("DROP FUNCTION IF EXISTS report_abstracts_stale()"))
+
+def source_hash(report) -> str:
+    digest = hashlib.sha1()
+    for column in SOURCE_COLUMNS:
+        digest.update(f"{getattr(report, column) or ''}\x1f".encode("utf-8"))
+    return digest.hexdigest()
+
+def parse_abstract(answer: str) -> dict:
+    """
+    Réponse du modèle (objet JSON, éventuellement entouré d'un bloc ```json) :
+    {"befund": ..., "diagnose": ..., "empfehlung": ...}
+    """
+    match = re.search(r"\{.*\}", answer, re.DOTALL)
+    if match is None:
+        raise ValueError("Réponse sans objet JSON")
+    data = json.loads(match.group())
+    if not isinstance(data, dict) or not any(data.get(key) for key in ("befund", "diagnose", "empfehlung")):
+        raise ValueError("Résumé vide ou incomplet")
+    return {
+        "findings": str(data.get("befund") or "").strip() or None,
+        "diagnosis": str(data.get("diagnose") or "").strip() or None,
+        "recommendation": str(data.get("empfehlung") or "").strip() or None,
+    }
+
+class ReportCondenser:
+    """
+    Traitement par lots des rapports sans résumé, au résumé périmé ('stale') ou d'une
+    version antérieure. condense(report) est une coroutine qui renvoie les champs du résumé
+    (GeminiService.condense_report). Un rapport en échec est écarté pendant un délai
+    doublé à chaque échec (retry_backoff, au plus retry_backoff_max).
+
+    En tâche de fond (désactivée si interval vaut 0), un passage d'au plus max_per_pass
+    rapports est lancé au démarrage, puis toutes les `interval` secondes ou dès l'appel
+    de wake() (nouveaux rapports ingérés). Les appels passent par le même pool Gemini
+    que le chat, au plus `concurrency` à la fois.
+    """
+    def __init__(self, session_factory, batch_size: int = 20, concurrency: int = 2,
+                 interval: float = 0.0, max_per_pass: int = 100,
+                 retry_backoff: float = 600.0, retry_backoff_max: float = 86400.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self.max_per_pass = max_per_pass
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._task = None
+        self._wake = None
+        # id du rapport -> (échecs consécutifs, instant monotone avant lequel il est écarté)
+        self._failures = {}
+        self.passes = 0
+        self.condensed = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.last_error = None
+        self.source_tokens = 0
+        self.abstract_tokens = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, condense):
+        if self.running or self.interval <= 0:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(condense))
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self, condense):
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_pass(condense, self.max_per_pass or None)
+            except Exception as e:
+                # Base ou modèle indisponible : nouvel essai au prochain passage
+                self.errors += 1
+                self.last_error = str(e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _backlog(self, after_id: str, limit: int):
+        query = (
+            select(Report)
+            .outerjoin(ReportAbstract, ReportAbstract.report_id == Report.id)
+            .where(or_(
+                ReportAbstract.report_id.is_(None),
+                ReportAbstract.status != FRESH,
+                ReportAbstract.version != ABSTRACT_VERSION,
+            ))
+            .order_by(Report.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(Report.id > after_id)
+        async with self.session_factory() as db:
+            rows = (await db.execute(query.add_columns(ReportAbstract.source_hash, ReportAbstract.version))).all()
+        return rows
+
+    async def run_pass(self, condense, limit: int = None) -> dict:
+        """
+        Parcourt le backlog une fois, par lots de batch_size rapports (au plus `limit`) ;
+        renvoie le nombre de résumés écrits, rafraîchis sans appel au modèle, en échec
+        et écartés après un échec récent
+        """
+        done = {"condensed": 0, "refreshed": 0, "failed": 0, "deferred": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        after_id = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+            rows = await self._backlog(after_id, size)
+            if not rows:
+                break
+            after_id = rows[-1][0].id
+            now = time.monotonic()
+            kept = [row for row in rows if self._failures.get(row[0].id, (0, 0.0))[1] <= now]
+            done["deferred"] += len(rows) - len(kept)
+            rows = kept
+            if remaining is not None:
+                remaining -= len(rows)
+
+            async def condense_one(report, stored_hash, stored_version):
+                current_hash = source_hash(report)
+                if stored_hash == current_hash and stored_version == ABSTRACT_VERSION:
+                    # Rapport modifié puis rétabli, ou mis à jour sans changement réel
+                    return report, current_hash, None
+                async with semaphore:
+                    try:
+                        return report, current_hash, await condense(report)
+                    except Exception as e:
+                        self.errors += 1
+                        self.last_error = f"{report.id}: {e}"
+                        failures = self._failures.get(report.id, (0, 0.0))[0] + 1
+                        self._failures[report.id] = (failures, time.monotonic() + self._backoff(failures))
+                        return report, current_hash, e
+
+            results = await asyncio.gather(*(condense_one(*row) for row in rows))
+            for report, _, fields in results:
+                if not isinstance(fields, Exception):
+                    self._failures.pop(report.id, None)
+            counts = await self._store([result for result in results if not isinstance(result[2], Exception)])
+            done["condensed"] += counts["condensed"]
+            done["refreshed"] += counts["refreshed"]
+            done["failed"] += sum(1 for result in results if isinstance(result[2], Exception))
+        self.passes += 1
+        return done
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.retry_backoff * 2 ** (failures - 1), self.retry_backoff_max)
+
+    async def _store(self, results) -> dict:
+        """
+        Écrit les résumés d'un lot en une transaction. Le texte est relu au moment de
+        l'écriture : un rapport modifié pendant l'appel au modèle garde un résumé 'stale'.
+        """
+        counts = {"condensed": 0, "refreshed": 0}
+        if not results:
+            return counts
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            current = {
+                row.id: source_hash(row)
+                for row in (await db.execute(
+                    select(Report.id, Report.title, Report.summary, Report.full_text)
+                    .where(Report.id.in_([report.id for report, _, _ in results]))
+                )).all()
+            }
+            for report, hash_value, fields in results:
+                if report.id not in current:
+                    continue  # rapport supprimé entre-temps
+                status = FRESH if current[report.id] == hash_value else STALE
+                if fields is None:
+                    abstract = await db.get(ReportAbstract, report.id)
+                    abstract.status = status
+                    counts["refreshed"] += 1
+                    continue
+                source_tokens = estimate_tokens(report.full_text or "")
+                abstract_tokens = estimate_tokens("".join(value or "" for value in fields.values()))
+                await db.merge(ReportAbstract(
+                    report_id=report.id, version=ABSTRACT_VERSION, source_hash=hash_value, status=status,
+                    source_tokens=source_tokens, abstract_tokens=abstract_tokens,
+                    created_at=now, updated_at=now, **fields
+                ))
+                counts["condensed"] += 1
+                self.source_tokens += source_tokens
+                self.abstract_tokens += abstract_tokens
+            await db.commit()
+        self.condensed += counts["condensed"]
+        self.refreshed += counts["refreshed"]
+        return counts
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "passes": self.passes,
+            "condensed": self.condensed,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "backing_off": sum(1 for _, retry_at in self._failures.values() if retry_at > time.monotonic()),
+            "source_tokens": self.source_tokens,
+            "abstract_tokens": self.abstract_tokens,
+            "compression_ratio": round(self.abstract_tokens / self.source_tokens, 3) if self.source_tokens else 0.0,
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import List
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from ..models.database import Patient, Report
+from ..schemas.schemas import ReportCreate
+
+# Au-delà, les erreurs sont seulement comptées
+MAX_REPORTED_ERRORS = 1000
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+async def ndjson_lines(chunks):
+    """
+    Lignes d'un flux NDJSON reçu par fragments. Seul le nouveau fragment est découpé ;
+    la fin de ligne incomplète est gardée en morceaux et assemblée une seule fois,
+    quelle que soit la longueur de la ligne.
+    """
+    partial = []
+    async for chunk in chunks:
+        if b"\n" not in chunk:
+            if chunk:
+                partial.append(chunk)
+            continue
+        lines = chunk.split(b"\n")
+        if partial:
+            partial.append(lines[0])
+            lines[0] = b"".join(partial)
+        last = lines.pop()
+        partial = [last] if last else []
+        for line in lines:
+            yield line
+    if partial:
+        yield b"".join(partial)
+
+class ReportIngestion:
+    """
+    Ingestion en masse de rapports : chaque ligne est validée, les lignes valides sont
+    insérées par lots (un INSERT multi-lignes et un commit par lot), les erreurs sont
+    rapportées ligne par ligne. on_inserted(reports) est appelé après chaque lot écrit,
+    pour tenir à jour les index et caches dérivés.
+
+    L'insertion d'un lot se poursuit pendant la lecture et la validation du lot suivant ;
+    la session n'est utilisée que par un lot à la fois.
+    """
+    def __init__(self, db, chunk_size: int = 1000, on_inserted=None):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.on_inserted = on_inserted
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self._chunk = []
+        self._known_patients = set()
+        self._write_task = None
+        self._started_at = time.perf_counter()
+
+    def error(self, row: int, report_id, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "id": report_id, "error": message})
+
+    async def add(self, row: int, data):
+        self.received += 1
+        if not isinstance(data, dict):
+            self.error(row, None, "Expected a JSON object")
+            return
+        supplied_id = data.get("id")
+        if not supplied_id:
+            # Id généré avant la validation : pas d'affectation sur le modèle validé
+            data = {**data, "id": str(uuid.uuid4())}
+        try:
+            report = ReportCreate.model_validate(data)
+        except ValidationError as e:
+            self.error(row, supplied_id, _validation_message(e))
+            return
+        self._chunk.append((row, report))
+        if len(self._chunk) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        """Envoie le lot en cours à l'insertion, après la fin de l'insertion précédente"""
+        await self._wait_for_write()
+        chunk, self._chunk = self._chunk, []
+        if not chunk:
+            return
+
+        # Contrôles groupés pour tout le lot : ids déjà en base, patients inconnus
+        existing = set(await self.db.scalars(
+            select(Report.id).where(Report.id.in_([report.id for _, report in chunk]))
+        ))
+        unknown = {report.patient_id for _, report in chunk} - self._known_patients
+        if unknown:
+            self._known_patients |= set(await self.db.scalars(select(Patient.id).where(Patient.id.in_(unknown))))
+
+        rows, seen = [], set()
+        for row, report in chunk:
+            if report.id in existing or report.id in seen:
+                self.error(row, report.id, "Report already exists")
+            elif report.patient_id not in self._known_patients:
+                self.error(row, report.id, "Patient not found")
+            else:
+                seen.add(report.id)
+                rows.append((row, report))
+        if not rows:
+            return
+
+        created_at = datetime.utcnow()
+        values = [{**report.model_dump(), "created_at": created_at} for _, report in rows]
+        self._write_task = asyncio.ensure_future(self._write(rows, values))
+
+    async def finish(self) -> dict:
+        await self.flush()
+        await self._wait_for_write()
+        return self.result()
+
+    def cancel(self):
+        """Requête interrompue : abandonne l'insertion en cours"""
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+
+    async def _wait_for_write(self):
+        task, self._write_task = self._write_task, None
+        if task is not None:
+            await task
+
+    async def _write(self, rows, values):
+        try:
+            await self.db.execute(insert(Report.__table__), values)
+            await self.db.commit()
+            written = [report for _, report in rows]
+        except IntegrityError:
+            await self.db.rollback()
+            written = await self._insert_one_by_one(rows, values)
+
+        self.inserted += len(written)
+        if written and self.on_inserted is not None:
+            self.on_inserted(written)
+
+    async def _insert_one_by_one(self, rows, values) -> List[ReportCreate]:
+        """Lot refusé (écriture concurrente) : ligne par ligne pour isoler les conflits"""
+        written = []
+        for (row, report), value in zip(rows, values):
+            try:
+                await self.db.execute(insert(Report.__table__), [value])
+                await self.db.commit()
+                written.append(report)
+            except IntegrityError as e:
+                await self.db.rollback()
+                self.error(row, report.id, f"Integrity error: {e.orig}")
+        return written
+
+    def result(self) -> dict:
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_s": round(elapsed, 3),
+            "reports_per_s": round(self.inserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,173 @@
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Mots vides allemands (les questions et rapports sont en allemand)
+STOPWORDS = frozenset("""
+aber alle als am an auch auf aus bei bin bis bitte da das dass dem den der des die dies diese
+dieser du ein eine einem einen einer es für gab gibt hat hatte ich ihr im in ist ja kein keine
+mit nach nicht noch oder seit sich sie sind so und uns vom von vor war waren was welche welcher
+wie wir wird wurde zu zum zur über
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.casefold()):
+        if token in STOPWORDS or (len(token) < 2 and not token.isdigit()):
+            continue
+        tokens.append(token)
+    return tokens
+
+def split_into_chunks(text: str, max_words: int) -> List[str]:
+    """
+    Découpe un texte en morceaux d'environ max_words mots, en respectant les phrases
+    """
+    sentences = re.split(r"(?<=[.!?])\s+", text.strip())
+    chunks, current, current_words = [], [], 0
+    for sentence in sentences:
+        words = len(sentence.split())
+        if current and current_words + words > max_words:
+            chunks.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(sentence)
+        current_words += words
+    if current:
+        chunks.append(" ".join(current))
+    return [chunk for chunk in chunks if chunk]
+
+class Chunk:
+    def __init__(self, report_id: str, position: int, text: str):
+        self.report_id = report_id
+        self.position = position
+        self.text = text
+
+class PatientIndex:
+    """
+    Index BM25 des morceaux de rapports d'un patient
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Chunk] = []
+        self.fingerprints: Dict[str, int] = {}
+        self._postings: Dict[str, List] = {}
+        self._lengths: List[int] = []
+        self._report_ids: List[str] = []
+
+    def add(self, report_id: str, fingerprint: int, texts: List[str]):
+        self.fingerprints[report_id] = fingerprint
+        for position, text in enumerate(texts):
+            index = len(self.chunks)
+            self.chunks.append(Chunk(report_id, position, text))
+            self._report_ids.append(report_id)
+            terms = Counter(tokenize(text))
+            self._lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, []).append((index, frequency))
+
+    def search(self, query: str, top_k: int, report_ids=None) -> List[tuple]:
+        """
+        Renvoie les top_k (score, Chunk) par score BM25 décroissant, scores nuls exclus.
+        report_ids limite la recherche à certains rapports (filtre de date).
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.chunks:
+            return []
+        lengths = np.asarray(self._lengths, dtype=np.float64)
+        average_length = max(lengths.mean(), 1.0)
+        normalization = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            indices = np.fromiter((index for index, _ in postings), dtype=np.int64, count=len(postings))
+            frequencies = np.fromiter((frequency for _, frequency in postings), dtype=np.float64, count=len(postings))
+            idf = np.log(1 + (len(self.chunks) - len(postings) + 0.5) / (len(postings) + 0.5))
+            scores[indices] += idf * frequencies * (self.k1 + 1) / (frequencies + normalization[indices])
+        if report_ids is not None:
+            allowed = np.fromiter((report_id in report_ids for report_id in self._report_ids),
+                                  dtype=bool, count=len(self._report_ids))
+            scores[~allowed] = 0.0
+        best = np.argsort(-scores)[:top_k]
+        return [(float(scores[index]), self.chunks[index]) for index in best if scores[index] > 0]
+
+class RetrievalIndex:
+    """
+    Index lexical par patient, entièrement local.
+
+    Les rapports sont découpés et indexés à la première question sur le patient,
+    puis seuls les nouveaux rapports sont ajoutés. Un rapport modifié entraîne la
+    reconstruction de l'index de ce patient ; la recherche est toujours restreinte
+    aux rapports passés en paramètre, un rapport supprimé n'est donc jamais renvoyé.
+    """
+    def __init__(self, chunk_words: int = 80, max_patients: int = 1000):
+        self.chunk_words = chunk_words
+        self.max_patients = max_patients
+        self._patients = OrderedDict()
+
+    @staticmethod
+    def _fingerprint(report) -> int:
+        return hash((report.title, report.full_text))
+
+    def _report_texts(self, report) -> List[str]:
+        return split_into_chunks(f"{report.title}. {report.full_text or ''}", self.chunk_words)
+
+    def sync(self, patient_id: str, reports) -> PatientIndex:
+        """Met l'index du patient à jour avec ses rapports actuels"""
+        index = self._patients.get(patient_id)
+        current = {report.id: self._fingerprint(report) for report in reports}
+        if index is not None and any(
+            report_id in index.fingerprints and index.fingerprints[report_id] != fingerprint
+            for report_id, fingerprint in current.items()
+        ):
+            index = None
+        if index is None:
+            index = PatientIndex()
+            self._patients[patient_id] = index
+        self._patients.move_to_end(patient_id)
+        for report in reports:
+            if report.id not in index.fingerprints:
+                index.add(report.id, current[report.id], self._report_texts(report))
+        while len(self._patients) > self.max_patients:
+            self._patients.popitem(last=False)
+        return index
+
+    def add_reports(self, patient_id: str, reports):
+        """Ajout incrémental de nouveaux rapports à un index déjà chargé"""
+        index = self._patients.get(patient_id)
+        if index is None:
+            return
+        for report in reports:
+            if report.id not in index.fingerprints:
+                index.add(report.id, self._fingerprint(report), self._report_texts(report))
+
+    def invalidate(self, patient_id: str):
+        self._patients.pop(patient_id, None)
+
+    def relevant_chunks(self, patient_id: str, reports, question: str, top_k: int,
+                        report_ids=None) -> Dict[str, List[str]]:
+        """
+        Morceaux les plus pertinents pour la question, regroupés par rapport
+        et dans l'ordre du texte
+        """
+        index = self.sync(patient_id, reports)
+        if report_ids is None:
+            report_ids = {report.id for report in reports}
+        selected: Dict[str, List[Chunk]] = {}
+        for _, chunk in index.search(question, top_k, report_ids):
+            selected.setdefault(chunk.report_id, []).append(chunk)
+        return {
+            report_id: [chunk.text for chunk in sorted(chunks, key=lambda c: c.position)]
+            for report_id, chunks in selected.items()
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "patients": len(self._patients),
+            "chunks": sum(len(index.chunks) for index in self._patients.values()),
+        }
@@ -0,0 +1,253 @@
+import re
+from typing import List, Optional
+from sqlalchemy import text
+
+# Recherche plein texte : FTS5 sur SQLite, tsvector + GIN sur PostgreSQL.
+# L'index est tenu à jour par la base elle-même (triggers SQLite, colonnes générées PostgreSQL),
+# quel que soit le chemin d'écriture (ORM, insertion en masse, SQL direct).
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+        patient_id, first_name, last_name, primary_condition,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+        report_id UNINDEXED, patient_id UNINDEXED, title, summary, full_text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+        INSERT INTO patients_fts (patient_id, first_name, last_name, primary_condition)
+        VALUES (new.id, new.first_name, new.last_name, new.primary_condition);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF id, first_name, last_name, primary_condition ON patients BEGIN
+        DELETE FROM patients_fts WHERE patient_id = old.id;
+        INSERT INTO patients_fts (patient_id, first_name, last_name, primary_condition)
+        VALUES (new.id, new.first_name, new.last_name, new.primary_condition);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+        DELETE FROM patients_fts WHERE patient_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+        INSERT INTO reports_fts (report_id, patient_id, title, summary, full_text)
+        VALUES (new.id, new.patient_id, new.title, new.summary, new.full_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF id, patient_id, title, summary, full_text ON reports BEGIN
+        DELETE FROM reports_fts WHERE report_id = old.id;
+        INSERT INTO reports_fts (report_id, patient_id, title, summary, full_text)
+        VALUES (new.id, new.patient_id, new.title, new.summary, new.full_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN
+        DELETE FROM reports_fts WHERE report_id = old.id;
+    END
+    """,
+]
+
+SQLITE_BACKFILL = [
+    "INSERT INTO patients_fts (patient_id, first_name, last_name, primary_condition) "
+    "SELECT id, first_name, last_name, primary_condition FROM patients",
+    "INSERT INTO reports_fts (report_id, patient_id, title, summary, full_text) "
+    "SELECT id, patient_id, title, summary, full_text FROM reports",
+    # Classement bm25 pondéré : titre > résumé > texte complet
+    "INSERT INTO patients_fts (patients_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 5.0, 2.0)')",
+    "INSERT INTO reports_fts (reports_fts, rank) VALUES ('rank', 'bm25(0.0, 0.0, 10.0, 5.0, 1.0)')",
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE patients ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(id, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') ||
+        setweight(to_tsvector('german', coalesce(primary_condition, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_patients_search_vector ON patients USING GIN (search_vector)",
+    """
+    ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('german', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('german', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('german', coalesce(full_text, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reports_search_vector ON reports USING GIN (search_vector)",
+]
+
+def create_search_index(connection):
+    """
+    Crée l'index plein texte s'il n'existe pas encore (idempotent), et l'alimente
+    avec les lignes existantes lors de sa création
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'"
+        )).first()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            for statement in SQLITE_BACKFILL:
+                connection.execute(text(statement))
+    elif dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+
+def drop_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        for trigger in ("patients_fts_insert", "patients_fts_update", "patients_fts_delete",
+                        "reports_fts_insert", "reports_fts_update", "reports_fts_delete"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        connection.execute(text("DROP TABLE IF EXISTS patients_fts"))
+        connection.execute(text("DROP TABLE IF EXISTS reports_fts"))
+    elif dialect == "postgresql":
+        connection.execute(text("DROP INDEX IF EXISTS ix_patients_search_vector"))
+        connection.execute(text("DROP INDEX IF EXISTS ix_reports_search_vector"))
+        connection.execute(text("ALTER TABLE patients DROP COLUMN IF EXISTS search_vector"))
+        connection.execute(text("ALTER TABLE reports DROP COLUMN IF EXISTS search_vector"))
+
+def search_terms(query: str) -> List[str]:
+    return TERM_PATTERN.findall(query)[:16]
+
+def _fts5_query(terms: List[str]) -> str:
+    # Chaque terme est cité (pas d'opérateurs utilisateur) et cherché en préfixe
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _tsquery(terms: List[str]) -> str:
+    return " & ".join(f"{term}:*" for term in terms)
+
+def _dialect(db) -> str:
+    # Session synchrone ou AsyncSession : le moteur lié porte le dialecte
+    return db.bind.dialect.name
+
+def patient_id_filter(db, search: str):
+    """
+    Critère SQLAlchemy sur Patient.id pour la recherche de la liste des patients.
+    Toujours la recherche d'origine (ILIKE sur l'id et les noms : fragments comme "3456"
+    pour "123456" ou "ller" pour "Müller"), complétée par l'index plein texte, qui
+    trouve aussi les termes dans le désordre et le diagnostic ("Max Muster")
+    """
+    from ..models.database import Patient
+
+    terms = search_terms(search)
+    if not terms:
+        return None
+    search_filter = f"%{search}%"
+    substring = (
+        Patient.first_name.ilike(search_filter) |
+        Patient.last_name.ilike(search_filter) |
+        Patient.id.ilike(search_filter)
+    )
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        matches = text("SELECT patient_id FROM patients_fts WHERE patients_fts MATCH :match").bindparams(
+            match=_fts5_query(terms)
+        ).columns(patient_id=Patient.id.type)
+        return substring | Patient.id.in_(matches)
+    if dialect == "postgresql":
+        return substring | text("patients.search_vector @@ to_tsquery('simple', :tsquery)").bindparams(
+            tsquery=_tsquery(terms)
+        )
+    return substring
+
+async def search_patients(db, query: str, limit: int) -> List[dict]:
+    terms = search_terms(query)
+    if not terms:
+        return []
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        statement = text(f"""
+            SELECT p.id, p.first_name, p.last_name, p.primary_condition,
+                   snippet(patients_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 10) AS snippet,
+                   patients_fts.rank AS rank
+            FROM patients_fts JOIN patients p ON p.id = patients_fts.patient_id
+            WHERE patients_fts MATCH :match
+            ORDER BY patients_fts.rank
+            LIMIT :limit
+        """).bindparams(match=_fts5_query(terms), limit=limit)
+    elif dialect == "postgresql":
+        statement = text(f"""
+            SELECT p.id, p.first_name, p.last_name, p.primary_condition,
+                   ts_headline('german', coalesce(p.primary_condition, ''), q,
+                               'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=15, MinWords=5') AS snippet,
+                   -ts_rank(p.search_vector, q) AS rank
+            FROM patients p, to_tsquery('simple', :tsquery) q
+            WHERE p.search_vector @@ q
+            ORDER BY rank
+            LIMIT :limit
+        """).bindparams(tsquery=_tsquery(terms), limit=limit)
+    else:
+        return []
+    return [
+        {
+            "id": row.id,
+            "first_name": row.first_name,
+            "last_name": row.last_name,
+            "primary_condition": row.primary_condition,
+            "snippet": row.snippet,
+            "score": round(-float(row.rank), 4),
+        }
+        for row in await db.execute(statement)
+    ]
+
+async def search_reports(db, query: str, limit: int, patient_id: Optional[str] = None) -> List[dict]:
+    terms = search_terms(query)
+    if not terms:
+        return []
+    dialect = _dialect(db)
+    params = {"limit": limit}
+    patient_clause = ""
+    if patient_id:
+        patient_clause = "AND r.patient_id = :patient_id"
+        params["patient_id"] = patient_id
+    if dialect == "sqlite":
+        statement = text(f"""
+            SELECT r.id, r.patient_id, r.type, r.title, r.date,
+                   snippet(reports_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 16) AS snippet,
+                   reports_fts.rank AS rank
+            FROM reports_fts JOIN reports r ON r.id = reports_fts.report_id
+            WHERE reports_fts MATCH :match {patient_clause}
+            ORDER BY reports_fts.rank
+            LIMIT :limit
+        """).bindparams(match=_fts5_query(terms), **params)
+    elif dialect == "postgresql":
+        statement = text(f"""
+            SELECT r.id, r.patient_id, r.type, r.title, r.date,
+                   ts_headline('german', coalesce(r.summary, '') || ' ' || coalesce(r.full_text, ''), q,
+                               'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=25, MinWords=8') AS snippet,
+                   -ts_rank(r.search_vector, q) AS rank
+            FROM reports r, to_tsquery('german', :tsquery) q
+            WHERE r.search_vector @@ q {patient_clause}
+            ORDER BY rank
+            LIMIT :limit
+        """).bindparams(tsquery=_tsquery(terms), **params)
+    else:
+        return []
+    return [
+        {
+            "id": row.id,
+            "patient_id": row.patient_id,
+            "type": row.type,
+            "title": row.title,
+            "date": row.date,
+            "snippet": row.snippet,
+            "score": round(-float(row.rank), 4),
+        }
+        for row in await db.execute(statement)
+    ]
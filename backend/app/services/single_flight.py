@@ -0,0 +1,119 @@
+import asyncio
+from typing import Dict
+
+class _Flight:
+    """Appel partagé en cours : la tâche qui l'exécute et ses abonnés"""
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        # Flux : fragments déjà reçus, rejoués aux abonnés arrivés en cours de route
+        self.parts = []
+        self.finished = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class SingleFlight:
+    """
+    Regroupement des appels identiques simultanés : le premier appel pour une clé est
+    exécuté dans sa propre tâche, les suivants attendent son résultat au lieu de
+    relancer l'appel. Une erreur est transmise à tous les appelants. L'appel est
+    annulé seulement quand tous les appelants sont partis.
+    """
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_waiters = 0
+
+    def _join(self, flights: Dict[str, _Flight], key: str, start) -> _Flight:
+        flight = flights.get(key)
+        if flight is None:
+            flight = _Flight(None)
+            flight.task = start(flight)
+            flights[key] = flight
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        self.max_waiters = max(self.max_waiters, flight.waiters)
+        return flight
+
+    def _leave(self, flight: _Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+    async def do(self, key: str, factory):
+        """Résultat de `await factory()`, partagé entre les appels simultanés de même clé"""
+        def start(flight):
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda done: self._finished(self._calls, key, flight, done))
+            return task
+
+        flight = self._join(self._calls, key, start)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(flight)
+
+    def _finished(self, flights: Dict[str, _Flight], key: str, flight: _Flight, task):
+        if flights.get(key) is flight:
+            del flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def stream(self, key: str, factory):
+        """Fragments du générateur factory(), diffusés à tous les flux simultanés de même clé"""
+        def start(flight):
+            return asyncio.ensure_future(self._pump(key, flight, factory()))
+
+        flight = self._join(self._streams, key, start)
+        index = 0
+        try:
+            while True:
+                changed = flight.changed
+                if index < len(flight.parts):
+                    index += 1
+                    yield flight.parts[index - 1]
+                elif flight.finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            self._leave(flight)
+
+    async def _pump(self, key: str, flight: _Flight, chunks):
+        try:
+            async for part in chunks:
+                flight.parts.append(part)
+                flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+            self.errors += 1
+        finally:
+            flight.finished = True
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            flight.notify()
+
+    def snapshot(self) -> dict:
+        requests = self.calls + self.coalesced
+        return {
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / requests, 3) if requests else 0.0,
+            "errors": self.errors,
+            "in_flight": len(self._calls) + len(self._streams),
+            "max_waiters": self.max_waiters,
+        }
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark du coût d'authentification par requête (get_current_user),
+sans cache utilisateur puis avec.
+
+    cd backend
+    python benchmarks/bench_auth.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench_auth.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, create_tables
+from app.models.database import User
+from app.routers.auth import get_current_user
+from app.services.auth import create_access_token, user_cache, user_token_claims
+
+async def run(iterations: int, cached: bool) -> float:
+    db = SessionLocal()
+    user = db.query(User).filter(User.email == "bench@klinik.de").first()
+    token = create_access_token(user_token_claims(user))
+    db.close()
+    user_cache.clear()
+    async with AsyncSessionLocal() as session:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            if not cached:
+                user_cache.clear()
+            await get_current_user(token=token, db=session)
+        elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6
+
+async def run_both(iterations: int):
+    try:
+        return await run(iterations, cached=False), await run(iterations, cached=True)
+    finally:
+        await async_engine.dispose()
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    create_tables()
+    db = SessionLocal()
+    # Le hash n'est jamais vérifié ici : pas besoin de bcrypt
+    db.add(User(email="bench@klinik.de", name="Bench", hashed_password="x" * 60))
+    db.commit()
+    db.close()
+
+    without_cache, with_cache = asyncio.run(run_both(iterations))
+    print(f"get_current_user, {iterations} appels")
+    print(f"  sans cache : {without_cache:8.1f} µs/requête")
+    print(f"  avec cache : {with_cache:8.1f} µs/requête")
+    print(f"  gain       : x{without_cache / with_cache:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Taille de l'historique envoyé à chaque question selon la longueur du fil : historique
+complet comparé à la mémoire bornée (résumé + derniers échanges). Le résumé est
+simulé (texte de taille fixe), sans appel à Gemini. Vérifie ensuite la détection des
+questions de suivi.
+
+    cd backend
+    python benchmarks/bench_chat_memory.py [échanges]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench_memory.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from datetime import date
+from app.database import AsyncSessionLocal, async_engine, create_tables, db_writer
+from app.models.database import ChatMessage, Patient
+from app.services.chat_memory import ConversationHistory, conversation_memory, is_follow_up
+from app.services.chat_store import chat_store
+
+QUESTION = "Wie hat sich der Befund seit der letzten Untersuchung entwickelt?"
+ANSWER = "1. **Befund:** Größenregrediente Läsion, keine neuen Herde. " * 6
+
+# Détection des questions de suivi (compteur follow_ups de la mémoire du chat)
+FOLLOW_UPS = [
+    "Und davor?",
+    "Gibt es Nebenwirkungen dazu?",
+    "Welche Medikamente nimmt sie aktuell?",
+    "Hat sich ihr Befund verbessert?",
+    "Was bedeutet das für die Prognose?",
+    "Ist er gewachsen?",
+    "Was bedeutet dieser Befund?",
+    "Erkläre das genauer",
+]
+STANDALONE = [
+    "Wie war der letzte CT-Befund?",
+    "Welche Therapie wurde empfohlen?",
+    "Wie ist der aktuelle Status?",
+    "Welche Befunde gibt es in diesem Jahr?",
+    "Wann wurde das Staging durchgeführt?",
+    "Hat der Patient Diabetes?",
+]
+
+async def summarize(summary, messages):
+    await asyncio.sleep(0)
+    return "- Bisher besprochen: Verlauf der Läsion, Therapieoptionen, offene Kontrollen. " * 8
+
+async def run(turns: int):
+    async with AsyncSessionLocal() as db:
+        db.add(Patient(id="P1", last_name="Muster", first_name="Max", birth_date=date(1960, 1, 1)))
+        await db.commit()
+    db_writer.start()
+    try:
+        await converse(turns)
+        check_follow_ups()
+    finally:
+        await conversation_memory.stop()
+        await db_writer.stop()
+        await async_engine.dispose()
+
+async def converse(turns: int):
+    checkpoints = {1, 10, 50, 100, 200, 500, turns}
+    full = []
+    print(f"{'échange':>8} {'historique complet':>20} {'mémoire bornée':>16} {'chargement':>11}")
+    for turn in range(1, turns + 1):
+        question_id = await chat_store.save("P1", "user", f"{QUESTION} ({turn})")
+        started_at = time.perf_counter()
+        history = await conversation_memory.load("P1", exclude_id=question_id)
+        load_ms = (time.perf_counter() - started_at) * 1000
+        if turn in checkpoints:
+            full_tokens = ConversationHistory(None, full, 10 ** 9).tokens
+            print(f"{turn:>8} {full_tokens:>13} tokens {history.tokens:>9} tokens {load_ms:>8.2f} ms")
+        await chat_store.save("P1", "ai", ANSWER)
+        full += [ChatMessage(sender="user", message=f"{QUESTION} ({turn})"), ChatMessage(sender="ai", message=ANSWER)]
+        conversation_memory.schedule_fold("P1", summarize)
+        await asyncio.sleep(0)
+
+def check_follow_ups():
+    for question in FOLLOW_UPS:
+        assert is_follow_up(question), f"question de suivi non reconnue : {question!r}"
+    for question in STANDALONE:
+        assert not is_follow_up(question), f"question autonome prise pour un suivi : {question!r}"
+    print(f"\nquestions de suivi : {len(FOLLOW_UPS)} suivis et {len(STANDALONE)} questions autonomes vérifiés")
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    create_tables()
+    asyncio.run(run(turns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Écritures concurrentes de messages de chat sur SQLite : configuration par défaut
+(un commit par message) puis profil SQLite (WAL, pragmas, écrivain unique par lots).
+
+    cd backend
+    python benchmarks/bench_chat_writes.py [clients] [messages_par_client]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * (len(values) - 1)))] * 1000
+
+async def write_messages(clients: int, messages: int):
+    from app.database import AsyncSessionLocal, async_engine, db_writer, sqlite_profile_enabled
+    from app.models.database import ChatMessage
+
+    async def insert(db):
+        message = ChatMessage(patient_id="bench", sender="user", message="Frage " * 20)
+        db.add(message)
+        await db.flush()
+        return message.id
+
+    async def direct():
+        # Chemin sans profil : une session et un commit par message
+        async with AsyncSessionLocal() as db:
+            await insert(db)
+            await db.commit()
+
+    latencies, failures = [], 0
+
+    async def client():
+        nonlocal failures
+        for _ in range(messages):
+            start = time.perf_counter()
+            try:
+                if db_writer.running:
+                    await db_writer.submit(insert)
+                else:
+                    await direct()
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    if sqlite_profile_enabled():
+        db_writer.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await db_writer.stop()
+    await async_engine.dispose()
+    return latencies, failures, elapsed
+
+def child(clients: int, messages: int):
+    from app.database import create_tables
+    create_tables()
+    latencies, failures, elapsed = asyncio.run(write_messages(clients, messages))
+    label = "profil SQLite + écrivain" if os.environ.get("SQLITE_PROFILE") == "true" else "par défaut"
+    print(f"  {label:26s}: {len(latencies) / elapsed:8.0f} écritures/s, "
+          f"p50 {percentile(latencies, 0.50):7.2f} ms, p99 {percentile(latencies, 0.99):7.2f} ms, "
+          f"{failures} erreurs")
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print(f"{clients} clients x {messages} messages")
+    for profile in ("false", "true"):
+        # Un processus par configuration : les moteurs sont créés à l'import
+        directory = tempfile.mkdtemp()
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench_writes.db')}",
+                   SECRET_KEY="benchmark", GEMINI_API_KEY="benchmark", SQLITE_PROFILE=profile)
+        subprocess.run([sys.executable, __file__, "--child", str(clients), str(messages)], env=env, check=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Routage des questions générales : ancien classement par mots-clés (plusieurs `in`
+sur la question mise en minuscules à chaque liste) comparé au routeur compilé.
+Affiche le débit et la part des questions répondues sans LLM, et vérifie le routage
+des cas attendus (adjectifs de Fachbereich ou statistiques sans patients : au LLM).
+
+    cd backend
+    python benchmarks/bench_intent_router.py [repetitions]
+"""
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.services.intent_router import IntentRouter, GENERAL, PATIENT_COUNT, PATIENT_LIST, STATISTICS
+
+QUESTIONS = [
+    "Patienten Kardiologie heute",
+    "Liste der Patienten in der Onkologie",
+    "Welche Patienten sind in der Orthopädie?",
+    "Zeige die ersten 5 Patienten der Chirurgie",
+    "Wie viele Patienten in der Kardiologie?",
+    "Anzahl Patienten seit 01.09.2025",
+    "Patienten vom 01.01.2025 bis 31.01.2025",
+    "orthopädische Patienten letzte Woche",
+    "Statistik",
+    "Zusammenfassung der Patientenzahlen",
+    "Was ist ein Mammakarzinom?",
+    "Wie behandelt man Patienten mit Herzinsuffizienz?",
+    "Welche Nebenwirkungen hat Cisplatin?",
+    "Erkläre die TNM-Klassifikation",
+    "Patientenliste Onkologie letzten 7 Tage",
+    "Orthopaedie",
+    "Welche onkologischen Therapien gibt es beim Rektumkarzinom?",
+    "Wann ist eine kardiologische Abklärung nötig?",
+    "Was macht ein Chirurg bei einer Appendizitis?",
+    "Gib mir eine Übersicht über die Therapieoptionen bei Lungenkrebs",
+    "Zusammenfassung der Leitlinien zur Pneumonie",
+    "Was ist eine statistisch signifikante Verteilung?",
+]
+
+# Routage attendu : (question, intention, Fachbereich)
+EXPECTED = [
+    ("Patienten Kardiologie heute", PATIENT_LIST, "Kardiologie"),
+    ("Orthopaedie", PATIENT_LIST, "Orthopädie"),
+    ("orthopädische Patienten letzte Woche", PATIENT_LIST, "Orthopädie"),
+    ("Liste der kardiologischen Fälle", PATIENT_LIST, "Kardiologie"),
+    ("Wie viele Patienten in der Kardiologie?", PATIENT_COUNT, "Kardiologie"),
+    ("Welche onkologischen Therapien gibt es beim Rektumkarzinom?", GENERAL, None),
+    ("Wann ist eine kardiologische Abklärung nötig?", GENERAL, None),
+    ("Was macht ein Chirurg bei einer Appendizitis?", GENERAL, None),
+    ("Wie viele onkologische Studien gibt es?", GENERAL, None),
+    ("Welche Nebenwirkungen hat Cisplatin?", GENERAL, None),
+    ("Statistik", STATISTICS, None),
+    ("Zusammenfassung der Patientenzahlen", STATISTICS, None),
+    ("Verteilung der Patienten in der Onkologie", STATISTICS, "Onkologie"),
+    ("Gib mir eine Übersicht über die Therapieoptionen bei Lungenkrebs", GENERAL, None),
+    ("Zusammenfassung der Leitlinien zur Pneumonie", GENERAL, None),
+    ("Was ist eine statistisch signifikante Verteilung?", GENERAL, None),
+]
+
+def legacy_classify(question: str) -> str:
+    """Classement d'origine de GeminiService (avant le routeur compilé)"""
+    if any(keyword in question.lower() for keyword in ['liste', 'patients', 'heute', 'chirurgie', 'onkologie', 'kardiologie']):
+        return 'patient_list'
+    elif any(keyword in question.lower() for keyword in ['statistik', 'anzahl', 'zusammenfassung']):
+        return 'statistics'
+    return 'general'
+
+def legacy_department(question: str):
+    if 'chirurgie' in question.lower():
+        return 'Chirurgie'
+    elif 'onkologie' in question.lower():
+        return 'Onkologie'
+    elif 'kardiologie' in question.lower():
+        return 'Kardiologie'
+    elif 'orthopädie' in question.lower():
+        return 'Orthopädie'
+    return None
+
+def legacy_route(question: str):
+    kind = legacy_classify(question)
+    return kind, legacy_department(question) if kind == 'patient_list' else None
+
+def measure(route, repetitions: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for question in QUESTIONS:
+            route(question)
+    return repetitions * len(QUESTIONS) / (time.perf_counter() - start)
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    router = IntentRouter()
+
+    print(f"{'question':52} {'ancien':>22}   routeur compilé")
+    for question in QUESTIONS:
+        kind, department = legacy_route(question)
+        intent = router.parse(question)
+        period = f" {intent.period_label()}" if intent.start_date else ""
+        print(f"{question[:52]:52} {kind + (f'/{department}' if department else ''):>22}   "
+              f"{intent.kind}{f'/{intent.department}' if intent.department else ''}{period}")
+
+    for question, kind, department in EXPECTED:
+        intent = router.parse(question)
+        assert (intent.kind, intent.department) == (kind, department), \
+            f"{question!r} : {intent.kind}/{intent.department}, attendu {kind}/{department}"
+    print(f"\nroutage  : {len(EXPECTED)} cas attendus vérifiés")
+
+    legacy = Counter(legacy_classify(question) for question in QUESTIONS)
+    compiled = Counter(router.parse(question).kind for question in QUESTIONS)
+    print()
+    print(f"sans LLM : ancien {1 - legacy['general'] / len(QUESTIONS):.0%}, "
+          f"routeur {1 - compiled[GENERAL] / len(QUESTIONS):.0%}")
+    print(f"débit    : ancien {measure(legacy_route, repetitions):9.0f} questions/s, "
+          f"routeur {measure(router.parse, repetitions):9.0f} questions/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Coût des métriques : une mesure d'histogramme, puis une requête ASGI minimale
+servie avec et sans MetricsMiddleware (sans réseau ni base).
+
+    cd backend
+    python benchmarks/bench_metrics.py [requêtes]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from fastapi import FastAPI
+from app.metrics import HTTP_BUCKETS, Histogram, MetricsMiddleware, registry
+
+def build_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/patients/{patient_id}")
+    def read_patient(patient_id: str):
+        return {"id": patient_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+async def serve(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started_at = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/patients/{i % 50}", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 0), "server": ("t", 80),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - started_at) / requests
+
+async def run(requests: int):
+    histogram = Histogram("bench", "bench", ["route", "status"], HTTP_BUCKETS)
+    started_at = time.perf_counter()
+    for i in range(requests * 10):
+        histogram.observe(0.001 * (i % 100), "/patients/{patient_id}", "200")
+    print(f"Histogram.observe : {(time.perf_counter() - started_at) / (requests * 10) * 1e9:.0f} ns")
+
+    plain, measured = build_app(False), build_app(True)
+    # Premier passage : construction des piles de middlewares
+    await serve(plain, 100)
+    await serve(measured, 100)
+    # Passages alternés, meilleur temps de chaque variante (moins sensible au bruit)
+    without, with_metrics = float("inf"), float("inf")
+    for _ in range(5):
+        without = min(without, await serve(plain, requests // 5))
+        with_metrics = min(with_metrics, await serve(measured, requests // 5))
+    print(f"requête sans métriques : {without * 1e6:.1f} µs")
+    print(f"requête avec métriques : {with_metrics * 1e6:.1f} µs ({(with_metrics - without) * 1e6:+.1f} µs)")
+
+    started_at = time.perf_counter()
+    text = registry.render()
+    print(f"export /metrics : {(time.perf_counter() - started_at) * 1000:.2f} ms, {len(text.splitlines())} lignes")
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    asyncio.run(run(requests))
+
+if __name__ == "__main__":
+    main()
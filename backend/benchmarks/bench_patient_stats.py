@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Réponse statistique de la cohorte selon le nombre de patients : agrégation sur la
+table patients (COUNT + GROUP BY) comparée à la lecture des compteurs tenus par triggers.
+
+    cd backend
+    python benchmarks/bench_patient_stats.py [patients ...]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench_stats.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from sqlalchemy import func, insert, select
+from app.database import AsyncSessionLocal, async_engine, create_tables, engine
+from app.models.database import Patient
+from app.schemas.schemas import DEPARTMENTS
+from app.services.patient_stats import patient_statistics
+
+async def group_by(db):
+    total = await db.scalar(select(func.count(Patient.id)))
+    rows = (await db.execute(
+        select(Patient.primary_condition, func.count(Patient.id)).group_by(Patient.primary_condition)
+    )).all()
+    return total, rows
+
+async def timed(query, repeat: int = 20) -> float:
+    async with AsyncSessionLocal() as db:
+        await query(db)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await query(db)
+        return (time.perf_counter() - start) / repeat * 1000
+
+def add_patients(start: int, count: int) -> float:
+    rows = [
+        {
+            "id": f"P{i:07d}", "last_name": f"Patient {i}", "first_name": "Bench",
+            "birth_date": date(1960, 1, 1), "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+            # Diagnostics libres : beaucoup de valeurs distinctes
+            "primary_condition": f"Diagnose {i % 5000}",
+        }
+        for i in range(start, start + count)
+    ]
+    started_at = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(insert(Patient.__table__), rows)
+    return (time.perf_counter() - started_at) / count * 1e6
+
+async def run(sizes):
+    total = 0
+    print(f"{'patients':>9} {'GROUP BY':>10} {'compteurs':>10} {'insertion':>11}")
+    for size in sizes:
+        insert_us = add_patients(total, size - total)
+        total = size
+        print(f"{size:>9} {await timed(group_by):>8.2f}ms {await timed(patient_statistics):>8.2f}ms "
+              f"{insert_us:>8.1f}µs/patient")
+    await async_engine.dispose()
+
+def main():
+    sizes = [int(value) for value in sys.argv[1:]] or [1000, 10000, 100000]
+    create_tables()
+    asyncio.run(run(sorted(sizes)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Contexte patient envoyé à Gemini selon le nombre de rapports : texte complet de chaque
+rapport comparé aux résumés structurés (report_abstracts). Affiche les tokens estimés
+du contexte et le temps de construction.
+
+    cd backend
+    python benchmarks/bench_report_abstracts.py [rapports ...]
+"""
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.models.database import Patient, Report, ReportAbstract
+from app.services.context_builder import PatientContextBuilder
+from app.services.report_abstracts import ABSTRACT_VERSION, FRESH
+
+# Compte rendu radiologique d'environ 600 mots
+FULL_TEXT = " ".join([
+    "CT Thorax/Abdomen mit Kontrastmittel. Vergleich mit der Voruntersuchung.",
+    "Lunge: keine suspekten Rundherde, keine Infiltrate, kein Pleuraerguss.",
+    "Leber: normal groß, homogen, keine fokalen Läsionen. Gallenblase unauffällig.",
+    "Lymphknoten: keine pathologisch vergrößerten Lymphknoten mediastinal oder retroperitoneal.",
+] * 30)
+
+def make_patient(report_count: int, with_abstracts: bool) -> Patient:
+    patient = Patient(id="P1", last_name="Muster", first_name="Max", birth_date=date(1960, 1, 1),
+                      primary_condition="Rektumkarzinom", current_status="Nachsorge")
+    patient.comorbidities = []
+    reports = []
+    for i in range(report_count):
+        report = Report(id=f"R{i:05d}", patient_id="P1", type="Radiologie", title=f"CT Staging {i}",
+                        date=date(2025, 1, 1) - timedelta(days=i), doctor="Dr. Radiologie",
+                        summary="Keine Progression.", full_text=FULL_TEXT)
+        if with_abstracts:
+            report.abstract = ReportAbstract(
+                report_id=report.id, version=ABSTRACT_VERSION, status=FRESH, source_hash="",
+                findings="Keine suspekten Rundherde, keine Lymphknotenvergrößerung, Leber unauffällig.",
+                diagnosis="Kein Anhalt für Rezidiv oder Metastasen.",
+                recommendation="Verlaufskontrolle in 6 Monaten.", updated_at=datetime(2025, 1, 1)
+            )
+        reports.append(report)
+    patient.reports = reports
+    return patient
+
+def measure(report_count: int, with_abstracts: bool, repeat: int = 20):
+    patient = make_patient(report_count, with_abstracts)
+    # Budget sans limite : tous les rapports entrent, seule la forme change
+    builder = PatientContextBuilder(token_budget=10 ** 9)
+    context = builder.build(patient)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        builder.build(patient)
+    return context.tokens, (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    sizes = [int(value) for value in sys.argv[1:]] or [5, 20, 100]
+    print(f"{'rapports':>9} {'texte complet':>15} {'résumés':>10} {'réduction':>10} {'construction':>20}")
+    for size in sizes:
+        full_tokens, full_ms = measure(size, False)
+        abstract_tokens, abstract_ms = measure(size, True)
+        print(f"{size:>9} {full_tokens:>9} tokens {abstract_tokens:>10} {1 - abstract_tokens / full_tokens:>9.0%} "
+              f"{full_ms:>8.2f} / {abstract_ms:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Débit de l'ingestion de rapports (lecture du flux NDJSON par fragments, validation,
+contrôles, insertion par lots et mise à jour de l'index plein texte) sur une base
+SQLite temporaire. Affiche aussi le plafond de SQLite seul (INSERT multi-lignes avec
+le trigger FTS5), qui borne le débit de bout en bout.
+
+    cd backend
+    python benchmarks/bench_report_ingest.py [rapports] [taille_des_lots]
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench_ingest.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, create_tables
+from app.models.database import Patient
+from app.services.report_ingest import ReportIngestion, ndjson_lines
+
+def report_lines(count: int):
+    for i in range(count):
+        yield json.dumps({
+            "patient_id": f"P{i % 500:04d}",
+            "type": "Radiologie" if i % 3 else "Pathologie",
+            "title": f"Befund {i}",
+            "date": "2025-01-15",
+            "doctor": "Dr. Bench",
+            "summary": "Kein Nachweis einer Progression.",
+            "full_text": "Untersuchung ohne pathologischen Befund, keine Raumforderung, " * 8,
+        })
+
+async def request_stream(body: bytes, fragment: int = 65536):
+    """Corps de requête reçu par fragments, comme request.stream()"""
+    for start in range(0, len(body), fragment):
+        yield body[start:start + fragment]
+
+async def run(body: bytes, chunk_size: int) -> dict:
+    async with AsyncSessionLocal() as db:
+        ingestion = ReportIngestion(db, chunk_size)
+        start = time.perf_counter()
+        row = 0
+        async for line in ndjson_lines(request_stream(body)):
+            row += 1
+            await ingestion.add(row, json.loads(line))
+        result = await ingestion.finish()
+        result["wall_s"] = time.perf_counter() - start
+    await async_engine.dispose()
+    return result
+
+def sqlite_ceiling(count: int, chunk_size: int) -> float:
+    """Mêmes lignes insérées directement avec sqlite3 dans une copie vide du schéma"""
+    path = os.path.join(tempfile.mkdtemp(), "ceiling.db")
+    source = sqlite3.connect(DATABASE_PATH)
+    target = sqlite3.connect(path)
+    for (sql,) in source.execute(
+        # Tables internes de FTS5 exclues : recréées par CREATE VIRTUAL TABLE
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND NOT (type = 'table' AND name GLOB '*_fts_*') "
+        "ORDER BY type = 'trigger', type = 'index'"
+    ):
+        target.execute(sql)
+    source.close()
+    rows = [
+        (f"C{i}", report["patient_id"], report["type"], report["title"], report["date"],
+         report["doctor"], report["summary"], report["full_text"], "2025-01-15 00:00:00")
+        for i, report in enumerate(map(json.loads, report_lines(count)))
+    ]
+    start = time.perf_counter()
+    for offset in range(0, count, chunk_size):
+        target.executemany(
+            "INSERT INTO reports (id, patient_id, type, title, date, doctor, summary, full_text, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows[offset:offset + chunk_size]
+        )
+        target.commit()
+    elapsed = time.perf_counter() - start
+    target.close()
+    return count / elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    create_tables()
+    db = SessionLocal()
+    db.add_all(Patient(id=f"P{i:04d}", first_name="Bench", last_name=f"Patient {i}",
+                       birth_date=date(1960, 1, 1)) for i in range(500))
+    db.commit()
+    db.close()
+
+    body = "".join(line + "\n" for line in report_lines(count)).encode("utf-8")
+    result = asyncio.run(run(body, chunk_size))
+    print(f"{count} rapports, lots de {chunk_size}")
+    print(f"  insérés : {result['inserted']} ({result['failed']} erreurs)")
+    print(f"  débit   : {result['inserted'] / result['wall_s']:8.0f} rapports/s")
+    print(f"  SQLite seul (FTS5 compris) : {sqlite_ceiling(count, chunk_size):8.0f} rapports/s")
+
+if __name__ == "__main__":
+    main()
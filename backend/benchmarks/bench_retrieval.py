@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Recherche d'extraits (BM25 local) sur les données d'exemple de main.create_sample_data,
+sans appel à Gemini. Les dossiers d'exemple sont courts : le seuil et le budget sont
+abaissés pour forcer le mode extraits. Vérifie que chaque question retient les morceaux
+du bon rapport, puis affiche le temps de construction du contexte.
+
+    cd backend
+    python benchmarks/bench_retrieval.py [repetitions]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "bench_retrieval.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["RETRIEVAL_MIN_CONTEXT_TOKENS"] = "20"
+os.environ["RETRIEVAL_TOP_K"] = "1"
+os.environ["RETRIEVAL_CHUNK_WORDS"] = "12"
+os.environ["CONTEXT_TOKEN_BUDGET"] = "400"
+
+from sqlalchemy.orm import selectinload
+from app.database import SessionLocal, create_tables
+from app.main import create_sample_data
+from app.models.database import Patient
+from app.services.gemini_service import GeminiService
+
+# (patient, question, rapport attendu)
+CASES = [
+    ("123456", "Wie war der letzte CT-Befund?", "onco_123456_1"),
+    ("123456", "Sind die Resektionsränder tumorfrei?", "onco_123456_2"),
+    ("234567", "Gibt es Fernmetastasen im CT?", "onco_234567_1"),
+    ("345678", "Wie verlief die Stentimplantation in der LAD?", "cardio_345678_1"),
+]
+
+def load_patients():
+    db = SessionLocal()
+    try:
+        patients = db.query(Patient).options(
+            selectinload(Patient.reports), selectinload(Patient.comorbidities)
+        ).all()
+        return {patient.id: patient for patient in patients}
+    finally:
+        db.close()
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    create_tables()
+    create_sample_data()
+    patients = load_patients()
+    # Aucun appel réseau : seuls l'index et le constructeur de contexte sont utilisés
+    service = GeminiService()
+
+    for patient_id, question, expected in CASES:
+        patient = patients[patient_id]
+        excerpts = service.retrieval_index.relevant_chunks(
+            patient.id, patient.reports, question, 1
+        )
+        context = service.build_patient_context(patient, None, question)
+        print(f"{question:46} -> {', '.join(excerpts) or '(aucun)'} "
+              f"({context.reports_excerpt} extrait(s), {context.tokens} tokens)")
+        assert list(excerpts) == [expected], (question, excerpts)
+        assert context.reports_excerpt == 1, context.as_metadata()
+        assert "Relevante Auszüge" in context.text
+
+    snapshot = service.retrieval_index.snapshot()
+    assert snapshot["patients"] == len({patient_id for patient_id, _, _ in CASES}), snapshot
+    print(f"index : {snapshot['patients']} patients, {snapshot['chunks']} morceaux")
+
+    patient = patients["123456"]
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        service.build_patient_context(patient, None, CASES[0][1])
+    print(f"contexte avec recherche : {(time.perf_counter() - start) / repetitions * 1e6:.0f} µs")
+
+if __name__ == "__main__":
+    main()
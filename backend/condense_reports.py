@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Condensation des rapports en une passe : résumé structuré (Befund, Diagnose, Empfehlung)
+de chaque rapport sans résumé, au résumé périmé ou d'une version antérieure.
+Le serveur peut faire la même chose en tâche de fond (REPORT_CONDENSE_INTERVAL > 0).
+
+    cd backend
+    python condense_reports.py [--limit N] [--batch-size N] [--concurrency N]
+"""
+import argparse
+import asyncio
+
+from app.config import settings
+from app.database import async_engine, create_tables, report_condenser
+from app.services.gemini_service import GeminiService
+
+async def run(limit: int):
+    service = GeminiService()
+    result = await report_condenser.run_pass(service.condense_report, limit)
+    await async_engine.dispose()
+    print(f"{result['condensed']} résumés écrits, {result['refreshed']} rafraîchis, {result['failed']} en échec")
+    snapshot = report_condenser.snapshot()
+    if snapshot["source_tokens"]:
+        print(f"tokens : {snapshot['source_tokens']} -> {snapshot['abstract_tokens']} "
+              f"({snapshot['compression_ratio']:.0%})")
+    if snapshot["last_error"]:
+        print(f"dernière erreur : {snapshot['last_error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None, help="nombre maximal de rapports traités")
+    parser.add_argument("--batch-size", type=int, default=settings.report_condense_batch_size)
+    parser.add_argument("--concurrency", type=int, default=settings.report_condense_concurrency)
+    args = parser.parse_args()
+    report_condenser.batch_size = args.batch_size
+    report_condenser.concurrency = args.concurrency
+    create_tables()
+    asyncio.run(run(args.limit))
+
+if __name__ == "__main__":
+    main()
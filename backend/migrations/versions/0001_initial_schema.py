@@ -0,0 +1,85 @@
+"""Schéma initial (tel que créé par create_tables avant les migrations)
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "patients",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("last_name", sa.String(), nullable=False),
+        sa.Column("first_name", sa.String(), nullable=False),
+        sa.Column("birth_date", sa.String(), nullable=False),
+        sa.Column("primary_condition", sa.String()),
+        sa.Column("current_status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_patients_id", "patients", ["id"])
+
+    op.create_table(
+        "comorbidities",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+    )
+    op.create_index("ix_comorbidities_id", "comorbidities", ["id"])
+
+    op.create_table(
+        "patient_comorbidity",
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id")),
+        sa.Column("comorbidity_id", sa.Integer(), sa.ForeignKey("comorbidities.id")),
+    )
+
+    op.create_table(
+        "reports",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id")),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("date", sa.String(), nullable=False),
+        sa.Column("doctor", sa.String(), nullable=False),
+        sa.Column("summary", sa.Text()),
+        sa.Column("full_text", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_reports_id", "reports", ["id"])
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id")),
+        sa.Column("sender", sa.String(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_chat_messages_id", "chat_messages", ["id"])
+
+
+def downgrade():
+    op.drop_table("chat_messages")
+    op.drop_table("reports")
+    op.drop_table("patient_comorbidity")
+    op.drop_table("comorbidities")
+    op.drop_table("patients")
+    op.drop_table("users")
@@ -0,0 +1,87 @@
+"""Colonnes Date pour patients.birth_date et reports.date, index (patient_id, date)
+
+Revision ID: 0002_typed_report_dates
+Revises: 0001_initial_schema
+Create Date: 2026-10-17
+"""
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_typed_report_dates"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+
+def _parse_birth_date(value):
+    # Format historique 'JJ.MM.AAAA', ISO accepté aussi
+    if "." in value:
+        return datetime.strptime(value.strip(), "%d.%m.%Y").date()
+    return date.fromisoformat(value.strip()[:10])
+
+
+def _parse_report_date(value):
+    return date.fromisoformat(value.strip()[:10])
+
+
+def _convert_column(table_name, column_name, parse, nullable=False):
+    """Remplace une colonne texte par une colonne Date en convertissant les lignes existantes"""
+    bind = op.get_bind()
+    temporary = f"{column_name}_typed"
+    with op.batch_alter_table(table_name) as batch:
+        batch.add_column(sa.Column(temporary, sa.Date(), nullable=True))
+
+    table = sa.table(
+        table_name,
+        sa.column("id", sa.String()),
+        sa.column(column_name, sa.String()),
+        sa.column(temporary, sa.Date()),
+    )
+    rows = bind.execute(sa.select(table.c.id, table.c[column_name])).all()
+    if rows:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam("row_id")).values({temporary: sa.bindparam("value")}),
+            [{"row_id": row_id, "value": parse(value)} for row_id, value in rows if value],
+        )
+
+    with op.batch_alter_table(table_name) as batch:
+        batch.drop_column(column_name)
+        batch.alter_column(temporary, new_column_name=column_name, nullable=nullable, existing_type=sa.Date())
+
+
+def _revert_column(table_name, column_name, render):
+    bind = op.get_bind()
+    temporary = f"{column_name}_text"
+    with op.batch_alter_table(table_name) as batch:
+        batch.add_column(sa.Column(temporary, sa.String(), nullable=True))
+
+    table = sa.table(
+        table_name,
+        sa.column("id", sa.String()),
+        sa.column(column_name, sa.Date()),
+        sa.column(temporary, sa.String()),
+    )
+    rows = bind.execute(sa.select(table.c.id, table.c[column_name])).all()
+    if rows:
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam("row_id")).values({temporary: sa.bindparam("value")}),
+            [{"row_id": row_id, "value": render(value)} for row_id, value in rows if value],
+        )
+
+    with op.batch_alter_table(table_name) as batch:
+        batch.drop_column(column_name)
+        batch.alter_column(temporary, new_column_name=column_name, nullable=False, existing_type=sa.String())
+
+
+def upgrade():
+    _convert_column("patients", "birth_date", _parse_birth_date)
+    _convert_column("reports", "date", _parse_report_date)
+    op.create_index("ix_reports_patient_id_date", "reports", ["patient_id", "date"])
+
+
+def downgrade():
+    op.drop_index("ix_reports_patient_id_date", table_name="reports")
+    _revert_column("reports", "date", lambda value: value.isoformat())
+    _revert_column("patients", "birth_date", lambda value: value.strftime("%d.%m.%Y"))
@@ -0,0 +1,22 @@
+"""Index plein texte des patients et rapports (FTS5 sur SQLite, tsvector sur PostgreSQL)
+
+Revision ID: 0003_full_text_search
+Revises: 0002_typed_report_dates
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+from app.services.search import create_search_index, drop_search_index
+
+revision = "0003_full_text_search"
+down_revision = "0002_typed_report_dates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
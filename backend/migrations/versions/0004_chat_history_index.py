@@ -0,0 +1,22 @@
+"""Index (patient_id, created_at, id) sur chat_messages
+
+Revision ID: 0004_chat_history_index
+Revises: 0003_full_text_search
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004_chat_history_index"
+down_revision = "0003_full_text_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_chat_messages_patient_created_id", "chat_messages", ["patient_id", "created_at", "id"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_chat_messages_patient_created_id", table_name="chat_messages")
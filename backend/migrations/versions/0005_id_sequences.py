@@ -0,0 +1,25 @@
+"""Table id_sequences (identifiants préalloués des messages du chat)
+
+Revision ID: 0005_id_sequences
+Revises: 0004_chat_history_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_id_sequences"
+down_revision = "0004_chat_history_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "id_sequences",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("next_value", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("id_sequences")
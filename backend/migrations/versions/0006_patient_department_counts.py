@@ -0,0 +1,47 @@
+"""Colonne patients.department indexée, compteurs par Fachbereich et par diagnostic
+
+Revision ID: 0006_patient_department_counts
+Revises: 0005_id_sequences
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.patient_stats import create_patient_stats, drop_patient_stats
+from app.services.search import create_search_index
+
+revision = "0006_patient_department_counts"
+down_revision = "0005_id_sequences"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("patients") as batch:
+        batch.add_column(sa.Column("department", sa.String(), nullable=True))
+    op.create_index("ix_patients_department", "patients", ["department"])
+    op.create_table(
+        "department_counts",
+        sa.Column("department", sa.String(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "condition_counts",
+        sa.Column("primary_condition", sa.String(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_condition_counts_count", "condition_counts", ["count"])
+    # Triggers et compteurs initialisés à partir des patients existants
+    create_patient_stats(op.get_bind())
+
+
+def downgrade():
+    drop_patient_stats(op.get_bind())
+    op.drop_index("ix_condition_counts_count", table_name="condition_counts")
+    op.drop_table("condition_counts")
+    op.drop_table("department_counts")
+    op.drop_index("ix_patients_department", table_name="patients")
+    with op.batch_alter_table("patients") as batch:
+        batch.drop_column("department")
+    # SQLite : la table patients est recréée, ses triggers plein texte avec elle
+    create_search_index(op.get_bind())
@@ -0,0 +1,43 @@
+"""Table analysis_jobs (analyses Gemini en arrière-plan)
+
+Revision ID: 0007_analysis_jobs
+Revises: 0006_patient_department_counts
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_analysis_jobs"
+down_revision = "0006_patient_department_counts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id"), nullable=True),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("run_after", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_analysis_jobs_patient_id", "analysis_jobs", ["patient_id"])
+    op.create_index("ix_analysis_jobs_status_priority", "analysis_jobs", ["status", "priority", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_analysis_jobs_status_priority", table_name="analysis_jobs")
+    op.drop_index("ix_analysis_jobs_patient_id", table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
@@ -0,0 +1,40 @@
+"""Table report_abstracts (résumés structurés des rapports) et triggers de péremption
+
+Revision ID: 0008_report_abstracts
+Revises: 0007_analysis_jobs
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.report_abstracts import create_abstract_triggers, drop_abstract_triggers
+
+revision = "0008_report_abstracts"
+down_revision = "0007_analysis_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "report_abstracts",
+        sa.Column("report_id", sa.String(), sa.ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("source_hash", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("findings", sa.Text(), nullable=True),
+        sa.Column("diagnosis", sa.Text(), nullable=True),
+        sa.Column("recommendation", sa.Text(), nullable=True),
+        sa.Column("source_tokens", sa.Integer(), nullable=True),
+        sa.Column("abstract_tokens", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_report_abstracts_status", "report_abstracts", ["status"])
+    create_abstract_triggers(op.get_bind())
+
+
+def downgrade():
+    drop_abstract_triggers(op.get_bind())
+    op.drop_index("ix_report_abstracts_status", table_name="report_abstracts")
+    op.drop_table("report_abstracts")
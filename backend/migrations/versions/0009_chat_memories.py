@@ -0,0 +1,29 @@
+"""Table chat_memories (résumé glissant des fils de discussion)
+
+Revision ID: 0009_chat_memories
+Revises: 0008_report_abstracts
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_chat_memories"
+down_revision = "0008_report_abstracts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_memories",
+        sa.Column("patient_id", sa.String(), sa.ForeignKey("patients.id"), primary_key=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("summarized_until_at", sa.DateTime(), nullable=True),
+        sa.Column("summarized_until_id", sa.Integer(), nullable=True),
+        sa.Column("summarized_messages", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("chat_memories")
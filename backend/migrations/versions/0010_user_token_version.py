@@ -0,0 +1,23 @@
+"""Colonne users.token_version (version des identifiants portée par les jetons)
+
+Revision ID: 0010_user_token_version
+Revises: 0009_chat_memories
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_user_token_version"
+down_revision = "0009_chat_memories"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
@@ -47,6 +47,13 @@ export interface ChatMessage {
   created_at: string;
 }
 
+export interface ChatHistoryStatus {
+  patient_id: string;
+  count: number;
+  last_id: number | null;
+  last_created_at: string | null;
+}
+
 export interface LoginRequest {
   username: string;
   password: string;
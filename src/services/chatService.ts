@@ -1,5 +1,5 @@
 import { apiRequest } from './api';
-import type { ChatMessage, ChatRequest, ChatResponse } from './api';
+import type { ChatHistoryStatus, ChatMessage, ChatRequest, ChatResponse } from './api';
 
 export class ChatService {
   static async sendMessage(chatRequest: ChatRequest): Promise<ChatResponse> {
@@ -12,4 +12,13 @@ export class ChatService {
   static async getChatHistory(patientId: string): Promise<ChatMessage[]> {
     return apiRequest(`/chat/${patientId}/history`);
   }
+
+  // Seulement les messages postérieurs au dernier message déjà affiché
+  static async getNewMessages(patientId: string, sinceId: number): Promise<ChatMessage[]> {
+    return apiRequest(`/chat/${patientId}/history?since_id=${sinceId}`);
+  }
+
+  static async getHistoryStatus(patientId: string): Promise<ChatHistoryStatus> {
+    return apiRequest(`/chat/${patientId}/history/status`);
+  }
 }